@@ -0,0 +1,340 @@
+import argparse
+import contextlib
+import filecmp
+import os
+import sys
+import tempfile
+
+from rules import (CLASS_RESULTS_DUE_DEFAULT, CLASS_RESULTS_DUE_RULES, ENROLMENT_RESULTS_DUE_DEFAULT,
+                   ENROLMENT_RESULTS_DUE_RULES, TEACHER_GIVEN_NAME_LENGTH, Contains)
+from schema import apply_schema
+
+### DataFrame Backends ###
+# The transforms that build the teachers, classes and enrolments frames sit behind a backend, so they can run on a
+# different DataFrame library without touching the rest of the export.
+#   pandas - the reference, runs the functions in create_files.py.
+#   polars - builds each frame as one Polars lazy query. Polars pushes the SACE and SWD filters down below the joins
+#            and runs the plan across every core. Polars is optional, pip install polars.
+# Both backends hand back pandas frames with the schema from schema.py, so merging, validating and writing the import
+# files is the same whichever backend built the frames. python backends.py checks they write the same import files.
+
+
+class PandasBackend:
+    """
+    The reference backend, the pandas functions in create_files.py.
+    """
+
+    name = "pandas"
+
+    def teachers(self, semester1_tfx, semester2_tfx, school_number):
+        """
+        Builds the teachers frame from both semesters, see create_files.get_teachers_dataframe.
+        """
+        # Imported here as create_files imports this module
+        from create_files import get_teachers_dataframe
+        return get_teachers_dataframe(semester1_tfx, semester2_tfx, school_number)
+
+    def classes(self, teachers_df, tfx_file, semester, school_number, year, msswd="ms"):
+        """
+        Builds the classes frame for one semester, see create_files.classes_import_dataframe.
+        """
+        from create_files import classes_import_dataframe
+        return classes_import_dataframe(teachers_df, tfx_file, semester, school_number, year, msswd)
+
+    def enrolments(self, tfx_file, semester, school_number, year, swd=False):
+        """
+        Builds the enrolments frame for one semester, see create_files.get_enrollments.
+        """
+        from create_files import get_enrollments
+        return get_enrollments(tfx_file, semester, school_number, year, swd)
+
+
+class PolarsBackend:
+    """
+    Backend that builds each frame as a Polars lazy query, giving the same rows in the same order as PandasBackend.
+    """
+
+    name = "polars"
+
+    def __init__(self):
+        try:
+            import polars
+        except ImportError:
+            raise ImportError("The polars backend needs Polars, install it with pip install polars.") from None
+
+    @staticmethod
+    def _section(tfx_file, section):
+        """
+        A tfx section as a Polars lazy frame, with the categorical columns as plain strings.
+        """
+        import polars as pl
+        return pl.from_pandas(tfx_file[section]).lazy().with_columns(pl.col(pl.Categorical).cast(pl.String))
+
+    @staticmethod
+    def _rules(rules, default, columns, **params):
+        """
+        The Polars expression for a table of rules from rules.py, the first matching rule wins like apply_rules.
+        """
+        import polars as pl
+
+        expression = None
+        for conditions, value in rules:
+            condition = pl.lit(True)
+            for key, expected in conditions.items():
+                if key in columns:
+                    if isinstance(expected, list):
+                        condition = condition & pl.col(key).is_in(expected)
+                    elif isinstance(expected, Contains):
+                        condition = condition & pl.col(key).str.contains(expected.text, literal=True)
+                    else:
+                        condition = condition & (pl.col(key) == expected)
+                elif key in params:
+                    condition = condition & pl.lit(params[key] == expected)
+                else:
+                    raise KeyError(f"Rule condition {key} is not a column or a parameter.")
+            # A condition that is null, from a missing value, does not match the same as in apply_rules
+            expression = (pl.when(condition) if expression is None else expression.when(condition)).then(pl.lit(value))
+        return expression.otherwise(pl.lit(default))
+
+    @staticmethod
+    def _join(left, right, on, how="inner"):
+        # Missing keys match each other and rows keep the left then right order, the same as pd.merge
+        return left.join(right, on=on, how=how, nulls_equal=True, maintain_order="left_right")
+
+    @staticmethod
+    def _to_pandas(plan, name):
+        return apply_schema(plan.collect().to_pandas(), name)
+
+    def teachers(self, semester1_tfx, semester2_tfx, school_number):
+        """
+        Builds the teachers frame from both semesters.
+        """
+        import polars as pl
+
+        def organise(tfx_file):
+            return self._section(tfx_file, "Teachers").select(
+                pl.col("TeacherID"),
+                pl.lit(school_number).alias("Contact School Number"),
+                pl.col("Code").alias("Teacher Code"),
+                pl.col("LastName").alias("Family Name"),
+                pl.col("FirstName").str.slice(0, 1).alias("Initials"),
+                pl.col("Salutation").alias("Title"),
+                pl.lit("T").alias("Type"),
+                pl.lit("").alias("Teachers Registration Number"),
+                pl.lit("").alias("Email Address"),
+                pl.col("FirstName").alias("Given Names"),
+                pl.lit("").alias("Date of Birth"),
+                pl.lit("").alias("Gender"),
+            )
+
+        plan = pl.concat([organise(semester1_tfx), organise(semester2_tfx)]).unique(keep="first", maintain_order=True)
+        return self._to_pandas(plan, "teachers")
+
+    def classes(self, teachers_df, tfx_file, semester, school_number, year, msswd="ms"):
+        """
+        Builds the classes frame for one semester.
+        """
+        import polars as pl
+
+        teachers = pl.from_pandas(teachers_df).lazy().with_columns(pl.col(pl.Categorical).cast(pl.String))
+        plan = self._join(teachers, self._section(tfx_file, "Timetable"), "TeacherID", "left")
+        plan = self._join(plan, self._section(tfx_file, "ClassNames"), "ClassNameID", "left")
+        plan = plan.unique(subset=["TeacherID", "ClassNameID"], keep="first", maintain_order=True)
+
+        # Only SACE classes, then SWD or Mainstream classes
+        swd_class = pl.col("BOSClassCode1").str.contains("SWD", literal=True)
+        plan = plan.filter(pl.col("SubjectCode").is_not_null() & pl.col("BOSClassCode1").is_not_null())
+        plan = plan.filter(swd_class if msswd == "swd" else ~swd_class)
+
+        plan = plan.select(
+            pl.lit(school_number).alias("Contact School Number"),
+            pl.lit(year).alias("Year"),
+            pl.col("BOSClassCode1").str.slice(0, 1).alias("Stage"),
+            pl.col("BOSClassCode1").str.slice(1, 3).alias("SACE Code"),
+            pl.col("BOSClassCode1").str.slice(4, 2).alias("Credits"),
+            pl.lit(None, dtype=pl.Int16).alias("Class Number"),
+            pl.lit("").alias("Program Variant"),
+            pl.lit(semester).alias("Semester"),
+            (pl.col("Given Names").str.slice(0, TEACHER_GIVEN_NAME_LENGTH) + pl.col("Family Name").str.slice(0, 1)).alias("Teacher Code"),
+            pl.col("Code").alias("School Class Code"),
+        )
+        plan = plan.with_columns(self._rules(CLASS_RESULTS_DUE_RULES, CLASS_RESULTS_DUE_DEFAULT, plan.collect_schema().names(), swd=msswd == "swd").alias("Results Due"))
+        return self._to_pandas(plan, "classes")
+
+    def enrolments(self, tfx_file, semester, school_number, year, swd=False):
+        """
+        Builds the enrolments frame for one semester.
+        """
+        import polars as pl
+
+        students = self._section(tfx_file, "Students")
+        has_bos_code = "BOSCode" in students.collect_schema().names()
+        if not has_bos_code:
+            print("No BOSCode found in tfx file, leaving Registration Number blank in Enrollments Import File.")
+        students = students.select(["Code", "BOSCode", "ClassCode"] if has_bos_code else ["Code", "ClassCode"]).unique(keep="first", maintain_order=True)
+
+        swd_class = pl.col("BOSClassCode1").str.contains("SWD", literal=True)
+        class_names = (
+            self._section(tfx_file, "ClassNames")
+            .select(pl.col("Code").alias("ClassCode"), "ClassNameID", "BOSClassCode1")
+            .filter(pl.col("BOSClassCode1").is_not_null())
+            .filter(swd_class if swd else ~swd_class)
+            .unique(keep="first", maintain_order=True)
+        )
+        class_teachers = self._join(
+            self._section(tfx_file, "Timetable").select("ClassNameID", "TeacherID").unique(keep="first", maintain_order=True),
+            self._section(tfx_file, "Teachers").select("TeacherID", pl.col("Code").alias("TeacherCode")),
+            "TeacherID",
+        ).unique(keep="first", maintain_order=True)
+
+        plan = self._join(self._join(students, class_names, "ClassCode"), class_teachers, "ClassNameID")
+        plan = plan.with_columns(
+            pl.lit(semester).alias("Semester"),
+            pl.col("BOSClassCode1").str.slice(0, 1).cast(pl.Int8, strict=False).alias("Stage"),
+            pl.col("BOSClassCode1").str.slice(1, 3).alias("SACE Code"),
+            pl.col("BOSClassCode1").str.slice(4, 2).alias("Credits"),
+        )
+        plan = plan.with_columns(self._rules(ENROLMENT_RESULTS_DUE_RULES, ENROLMENT_RESULTS_DUE_DEFAULT, plan.collect_schema().names()).alias("Results Due"))
+
+        # Class Numbers, the same as create_files.generate_class_number: each ClassCode takes the next number within its
+        # Stage, SACE Code and Credits in the order it is first seen, rows missing any of those get 0
+        group_keys = ["Stage", "SACE Code", "Credits"]
+        class_keys = group_keys + ["ClassCode"]
+        plan = plan.with_row_index("_row")
+        plan = plan.with_columns((pl.col("_row") == pl.col("_row").min().over(class_keys)).cast(pl.Int64).alias("_first"))
+        plan = plan.with_columns(pl.col("_first").cum_sum().over(group_keys).alias("_sequence"))
+        plan = plan.with_columns(
+            pl.when(pl.any_horizontal(pl.col(group_keys).is_null())).then(0).otherwise(pl.col("_sequence").first().over(class_keys)).alias("Class Number")
+        )
+
+        plan = plan.select(
+            pl.lit(school_number).alias("Contact School Number"),
+            (pl.col("BOSCode") if has_bos_code else pl.lit("")).alias("Registration Number"),
+            pl.col("Code").alias("Student Code"),
+            pl.lit(year).alias("Year"),
+            "Semester",
+            "Stage",
+            "SACE Code",
+            "Credits",
+            pl.lit("").alias("Enrolment Number"),
+            "Results Due",
+            pl.lit("").alias("Program Variant"),
+            pl.lit(school_number).alias("Teaching School Number"),
+            pl.lit(school_number).alias("Assessment School Number"),
+            "Class Number",
+            pl.lit("E").alias("Enrolment Status"),
+            pl.lit("N").alias("Repeat Indicator"),
+            pl.col("ClassCode").alias("School Class Code"),
+            pl.lit("").alias("Stage 1 Grade"),
+            pl.lit("").alias("Partial Credits"),
+            pl.col("Code").alias("ED ID"),
+        )
+        return self._to_pandas(plan, "enrolments")
+
+
+BACKENDS = {
+    "pandas": PandasBackend,
+    "polars": PolarsBackend,
+}
+
+
+def get_backend(name):
+    """
+    Makes the backend with the given name.
+
+    Parameters:
+    name (str): One of the names in BACKENDS.
+
+    Returns:
+    PandasBackend or PolarsBackend: The backend.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name}, use one of {', '.join(BACKENDS)}.")
+    return BACKENDS[name]()
+
+
+### Parity Check ###
+# The backends must write byte-identical import files. check_parity exports a school with every backend and compares
+# the files, and also compares the SWD frames that the export does not write yet.
+
+
+def check_parity(semester1_path, semester2_path, school_number=999, year=2000, backends=tuple(BACKENDS)):
+    """
+    Exports one school with every backend and compares the files and frames byte for byte.
+
+    Parameters:
+    semester1_path (str): Path to the Semester 1 tfx file.
+    semester2_path (str): Path to the Semester 2 tfx file.
+    school_number (int): The Schools Online school number.
+    year (int): The year being exported.
+    backends (tuple): Names of the backends to compare, the first is the reference.
+
+    Returns:
+    list: A message for each file or frame that differs from the reference backend.
+    """
+    # Imported here as create_files imports this module
+    from create_files import export_school
+    from tfx_model import TfxModel, copy_on_write
+
+    differences = []
+    with tempfile.TemporaryDirectory() as folder, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name in backends:
+            export_school(school_number, year, semester1_path, semester2_path, os.path.join(folder, name), incremental_export=False, backend=name)
+
+        reference = os.path.join(folder, backends[0])
+        file_names = sorted(file_name for file_name in os.listdir(reference) if file_name.endswith(".csv"))
+        for name in backends[1:]:
+            for file_name in file_names:
+                path = os.path.join(folder, name, file_name)
+                if not os.path.exists(path) or not filecmp.cmp(os.path.join(reference, file_name), path, shallow=False):
+                    differences.append(f"{name} {file_name} differs from {backends[0]}")
+
+        # The SWD frames, rendered the same way as the import files
+        models = [TfxModel(semester1_path), TfxModel(semester2_path)]
+        frames = {}
+        for name in backends:
+            backend = get_backend(name)
+            with copy_on_write():
+                teachers_df = backend.teachers(*models, school_number)
+                frames[name] = {"teachers": teachers_df.to_csv(index=False)}
+                for semester, model in enumerate(models, start=1):
+                    frames[name][f"enrolments S{semester} SWD"] = backend.enrolments(model, semester, school_number, year, swd=True).to_csv(index=False)
+                    frames[name][f"classes S{semester} SWD"] = backend.classes(teachers_df, model, semester, school_number, year, "swd").to_csv(index=False)
+        for name in backends[1:]:
+            for frame, text in frames[backends[0]].items():
+                if frames[name][frame] != text:
+                    differences.append(f"{name} {frame} frame differs from {backends[0]}")
+
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check every backend writes the same import files.")
+    parser.add_argument("tfx", nargs="*", help="Semester 1 and Semester 2 tfx files to check, defaults to synthetic timetables")
+    parser.add_argument("--students", type=int, nargs="+", default=[200, 2000], help="sizes of the synthetic timetables")
+    parser.add_argument("--seeds", type=int, default=3, help="number of synthetic timetables of each size")
+    args = parser.parse_args()
+
+    # The synthetic timetables are removed once checked
+    with tempfile.TemporaryDirectory() as data_folder:
+        if args.tfx:
+            cases = {"given files": tuple(args.tfx)}
+        else:
+            from synthetic_tfx import write_year
+
+            cases = {
+                f"{students} students seed {seed}": write_year(os.path.join(data_folder, f"{students}_{seed}"), 2000, students=students, swd_ratio=0.2, seed=seed)
+                for students in args.students
+                for seed in range(args.seeds)
+            }
+
+        print("Backend parity:")
+        failed = 0
+        for case, (semester1, semester2) in cases.items():
+            found = check_parity(semester1, semester2)
+            failed += bool(found)
+            print(f"    {case:<28} {'same' if not found else 'DIFFERENT'}")
+            for difference in found:
+                print(f"        {difference}")
+    if failed:
+        sys.exit(1)
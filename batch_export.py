@@ -0,0 +1,153 @@
+import argparse
+import csv
+import os
+import sys
+import time
+import tomllib
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+### Multi-School Batch Export ###
+# Exports many schools from a manifest, each school runs in its own process with its own output folder so one
+# school failing does not stop the others.
+#
+# The manifest is a TOML file with a [[school]] table per school:
+#   [[school]]
+#   school_number = 245
+#   year = 2025
+#   semester1_tfx = "V:\\Timetabler\\Current Timetable\\2025\\TTD_2025_S1.tfx"
+#   semester2_tfx = "V:\\Timetabler\\Current Timetable\\2025\\TTD_2025_S2.tfx"
+#   output_folder = "optional, defaults to <output root>\\<school_number>_<year>"
+#
+# or a CSV file with the same column names.
+
+MANIFEST_FIELDS = ["school_number", "year", "semester1_tfx", "semester2_tfx"]
+
+
+def read_manifest(path):
+    """
+    Reads the list of schools to export from a TOML or CSV manifest.
+
+    Parameters:
+    path (str): Path to the manifest file.
+
+    Returns:
+    list: A dict for each school with school_number, year, semester1_tfx, semester2_tfx and optionally output_folder.
+    """
+    if path.lower().endswith(".toml"):
+        with open(path, "rb") as manifest_file:
+            schools = tomllib.load(manifest_file).get("school", [])
+    else:
+        with open(path, "r", newline="") as manifest_file:
+            schools = [{key: value for key, value in row.items() if value} for row in csv.DictReader(manifest_file)]
+
+    for number, school in enumerate(schools, start=1):
+        missing = [field for field in MANIFEST_FIELDS if field not in school]
+        if missing:
+            raise ValueError(f"School {number} in {path} is missing {', '.join(missing)}.")
+        school["school_number"] = int(school["school_number"])
+        school["year"] = int(school["year"])
+
+    return schools
+
+
+def _export(school, output_workers, incremental_export):
+    """
+    Exports one school in a worker process, any error is returned rather than raised so the batch carries on.
+    """
+    # Imported here so each worker process loads the exporter itself
+    from create_files import export_school
+
+    start = time.perf_counter()
+    try:
+        summary = export_school(
+            school["school_number"],
+            school["year"],
+            school["semester1_tfx"],
+            school["semester2_tfx"],
+            school["output_folder"],
+            output_workers,
+            incremental_export,
+        )
+        summary["error"] = None
+    except Exception:
+        summary = {"school_number": school["school_number"], "year": school["year"], "error": traceback.format_exc()}
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(schools, output_root, workers=None, output_workers=1, incremental_export=True):
+    """
+    Exports every school in the manifest across a pool of processes and prints a throughput summary.
+
+    Parameters:
+    schools (list): The schools from read_manifest.
+    output_root (str): Folder the per school output folders are created in.
+    workers (int): Number of schools to export at the same time, defaults to the number of CPUs.
+    output_workers (int): Number of import files each school writes at the same time.
+    incremental_export (bool): Only rebuild and rewrite what has changed since each school's last export.
+
+    Returns:
+    list: The export summary for each school, with an error traceback for any school that failed.
+    """
+    for school in schools:
+        school.setdefault("output_folder", os.path.join(output_root, f"{school['school_number']}_{school['year']}"))
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_export, school, output_workers, incremental_export): school for school in schools}
+        for future in as_completed(futures):
+            school = futures[future]
+            try:
+                result = future.result()
+            except Exception:
+                # The worker process itself died, the other schools are still exported
+                result = {"school_number": school["school_number"], "year": school["year"], "error": traceback.format_exc(), "seconds": 0.0}
+            results.append(result)
+    elapsed = time.perf_counter() - start
+
+    print_batch_summary(results, elapsed)
+    return results
+
+
+def print_batch_summary(results, elapsed):
+    """
+    Prints the outcome of each school and the overall throughput of the batch.
+
+    Parameters:
+    results (list): The export summary for each school.
+    elapsed (float): Wall time of the whole batch in seconds.
+
+    Returns:
+    None
+    """
+    failed = [result for result in results if result["error"]]
+    enrolments = sum(result.get("enrolments", 0) for result in results if not result["error"])
+
+    print("Batch Export:")
+    for result in sorted(results, key=lambda result: (result["school_number"], result["year"])):
+        if result["error"]:
+            status = "FAILED " + result["error"].strip().splitlines()[-1]
+        else:
+            status = f"{result['enrolments']} enrolments, {result['classes']} classes, {result['teachers']} teachers"
+        print(f"    {result['school_number']:>6} {result['year']} {result['seconds']:>8.2f} s  {status}")
+
+    print(f"{len(results) - len(failed)} of {len(results)} schools exported in {elapsed:.2f} s")
+    if elapsed > 0:
+        print(f"{len(results) / elapsed:.2f} schools/s, {enrolments / elapsed:.0f} enrolments/s")
+    for result in failed:
+        print(f"\nSchool {result['school_number']} {result['year']} failed:\n{result['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export Schools Online import files for every school in a manifest.")
+    parser.add_argument("manifest", help="TOML or CSV file listing school_number, year, semester1_tfx and semester2_tfx")
+    parser.add_argument("--output", default="schools_online_import_files", help="folder the per school output folders are created in")
+    parser.add_argument("--workers", type=int, default=None, help="number of schools to export at the same time")
+    parser.add_argument("--full", action="store_true", help="rebuild and rewrite everything instead of exporting incrementally")
+    args = parser.parse_args()
+
+    batch_results = run_batch(read_manifest(args.manifest), args.output, args.workers, incremental_export=not args.full)
+    if any(result["error"] for result in batch_results):
+        sys.exit(1)
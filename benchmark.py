@@ -0,0 +1,206 @@
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from synthetic_tfx import write_year
+
+### Benchmark Suite ###
+# Times each stage of the exporter against synthetic tfx files of several sizes and records the wall time and peak
+# memory of each, so a change that slows the exporter down shows up before it is run against a real timetable.
+# Save a run with --save and compare later runs against it with --compare.
+
+# Number of students for each size, classes and teachers scale with the students
+SIZES = {
+    "small": 500,
+    "medium": 2500,
+    "large": 10000,
+}
+
+# Stage timings are the best of this many runs
+REPEAT = 3
+
+# A stage is a regression when it is this much slower or uses this much more memory than the saved run
+TOLERANCE = 0.25
+
+# Differences smaller than this are timing noise and never a regression
+NOISE_SECONDS = 0.01
+NOISE_MB = 0.5
+
+
+def measure(func, repeat=REPEAT):
+    """
+    Measures the best wall time over a number of runs, and the peak Python memory of one traced run.
+
+    Parameters:
+    func (callable): The code to measure, called with no arguments.
+    repeat (int): Number of timed runs.
+
+    Returns:
+    dict: The best time in seconds and the peak memory in MB.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    # Memory is traced on its own run as tracing slows the code down
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds": min(times), "peak_mb": peak / 1024 / 1024}
+
+
+@contextlib.contextmanager
+def _quiet():
+    """
+    The exporter prints as it goes, this keeps the benchmark output readable.
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def benchmark_size(name, students, folder, repeat=REPEAT):
+    """
+    Benchmarks every stage of the exporter against one size of synthetic timetable.
+
+    Parameters:
+    name (str): Name of the size.
+    students (int): Number of students in the synthetic timetable.
+    folder (str): Folder for the synthetic tfx files and the import files.
+    repeat (int): Number of timed runs of each stage.
+
+    Returns:
+    dict: Stage name mapped to its measurements.
+    """
+    # Imported here so the synthetic files are in place before the exporter is loaded
+    import create_files
+    import frame_store
+    from import_writer import CLASS_FILES, ENROLMENT_FILES, partition, write_import_files
+    from tfx_model import TfxModel, copy_on_write
+
+    school_number, year = 999, 2000
+    semester1_path, semester2_path = write_year(os.path.join(folder, name), year, students=students, seed=1)
+    output_folder = os.path.join(folder, name, "output")
+    os.makedirs(output_folder, exist_ok=True)
+
+    def load():
+        semester1_tfx, semester2_tfx = TfxModel(semester1_path), TfxModel(semester2_path)
+        semester1_tfx.load()
+        semester2_tfx.load()
+        return semester1_tfx, semester2_tfx
+
+    # Inputs for each stage are built once from the stage before, only the stage itself is measured
+    with _quiet(), copy_on_write():
+        semester1_tfx, semester2_tfx = load()
+        teachers_df = create_files.get_teachers_dataframe(semester1_tfx, semester2_tfx, school_number)
+        enrollments = [create_files.get_enrollments(tfx, semester, school_number, year) for semester, tfx in [(1, semester1_tfx), (2, semester2_tfx)]]
+        classes = [create_files.classes_import_dataframe(teachers_df, tfx, semester, school_number, year) for semester, tfx in [(1, semester1_tfx), (2, semester2_tfx)]]
+        numbering_df = enrollments[0].rename(columns={"School Class Code": "ClassCode"})
+        all_enrollments, classes_import = create_files.merge_semesters(*enrollments, *classes)
+
+    def write():
+        output_files = {"TeacherImport.csv": create_files.get_only_sace_teachers(teachers_df.copy(), classes_import)}
+        output_files.update(partition(classes_import, CLASS_FILES))
+        output_files.update(partition(all_enrollments, ENROLMENT_FILES))
+        write_import_files(output_files, output_folder)
+
+    stages = {
+        "load": load,
+        "get_teachers_dataframe": lambda: create_files.get_teachers_dataframe(semester1_tfx, semester2_tfx, school_number),
+        "get_enrollments": lambda: create_files.get_enrollments(semester1_tfx, 1, school_number, year),
+        "generate_class_number": lambda: create_files.generate_class_number(numbering_df.copy()),
+        "classes_import_dataframe": lambda: create_files.classes_import_dataframe(teachers_df, semester1_tfx, 1, school_number, year),
+        "merge_semesters": lambda: create_files.merge_semesters(*enrollments, *classes),
+        "write_import_files": write,
+        "export_school": lambda: create_files.export_school(school_number, year, semester1_path, semester2_path, output_folder, incremental_export=False),
+    }
+
+    # Opening the frames saved as Arrow files replaces load (parsing the tfx JSON) and the three stages that build them
+    if frame_store.pa is not None:
+        store = frame_store.FrameStore(os.path.join(folder, name, "frames"), semester1_path, semester2_path, school_number, year)
+        for frame_name, df in zip(frame_store.FRAME_NAMES, [teachers_df, *enrollments, *classes]):
+            frame_store.write_frame(df, store.path(frame_name))
+        stages["frame_store_reload"] = store.open
+
+    results = {"rows": {"students": students, "enrolments": len(all_enrollments), "classes": len(classes_import)}}
+    for stage, func in stages.items():
+        with _quiet(), copy_on_write():
+            results[stage] = measure(func, repeat)
+        print(f"    {name:<8} {stage:<26} {results[stage]['seconds']:>9.3f} s {results[stage]['peak_mb']:>9.1f} MB")
+    return results
+
+
+def run_benchmarks(sizes=None, repeat=REPEAT):
+    """
+    Benchmarks the exporter at each size.
+
+    Parameters:
+    sizes (list): Names of the sizes to run, defaults to all of SIZES.
+    repeat (int): Number of timed runs of each stage.
+
+    Returns:
+    dict: Size name mapped to the stage measurements.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name in sizes or SIZES:
+            results[name] = benchmark_size(name, SIZES[name], folder, repeat)
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Compares a benchmark run against a saved run.
+
+    Parameters:
+    results (dict): The new run.
+    baseline (dict): The saved run.
+    tolerance (float): How much slower or larger a stage may be before it is a regression, 0.25 is 25%.
+
+    Returns:
+    list: A message for each regression.
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, result in stages.items():
+            saved = baseline.get(size, {}).get(stage)
+            if stage == "rows" or saved is None:
+                continue
+            for measurement, unit, noise in [("seconds", "s", NOISE_SECONDS), ("peak_mb", "MB", NOISE_MB)]:
+                if result[measurement] > max(saved[measurement] * (1 + tolerance), saved[measurement] + noise):
+                    regressions.append(f"{size} {stage} {measurement}: {saved[measurement]:.3f} {unit} -> {result[measurement]:.3f} {unit}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the exporter against synthetic timetables.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=None, help="sizes to run, defaults to all")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="number of timed runs of each stage")
+    parser.add_argument("--save", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results against a JSON file saved with --save")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    print("Benchmarks:")
+    benchmark_results = run_benchmarks(args.sizes, args.repeat)
+
+    if args.save:
+        with open(args.save, "w") as results_file:
+            json.dump(benchmark_results, results_file, indent=4)
+
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            found = compare(benchmark_results, json.load(baseline_file), args.tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            sys.exit(1)
+        print("No regressions.")
@@ -1,9 +1,9 @@
 import datetime
 from pathlib import Path
-import sys
 
 ### Configuration File ###
 # This file contains the configuration for the script, including file paths and other settings related to your school
+# Importing it does nothing but set the values below, the timetable folder is only looked for when filePath is used.
 
 # Year Creation and Open File
 year = datetime.date.today().year
@@ -12,39 +12,102 @@ year = datetime.date.today().year
 schoolNumber = 245
 
 """ File Paths """
-# School
-filePath              = f"V:\\Timetabler\\Current Timetable\\{year}"
+# The folders the tfx files may be in, the first one that exists is used, make it easier to switch between locations.
+# To always use one folder, set filePath = "<folder>" at the end of this file.
+timetable_folders = [
+    # School
+    f"V:\\Timetabler\\Current Timetable\\{year}",
+    # Laptop OneDrive
+    f"C:\\Users\\deldridge\\OneDrive - Department for Education\\Documents\\Timetabling\\{year}",
+    # Desktop OneDrive
+    f"C:\\Users\\demg\\OneDrive - Department for Education\\Documents\\Timetabling\\{year}",
+]
 
-# Laptop OneDrive
-main_path_laptop      = f"C:\\Users\\deldridge\\OneDrive - Department for Education\\Documents\\Timetabling\\{year}"
+# Output Folder, created when the import files are written.
+output_folder = "schools_online_import_files"
 
-# Desktop OneDrive
-main_path_desktop     = f"C:\\Users\\demg\\OneDrive - Department for Education\\Documents\\Timetabling\\{year}"
+# Number of import files to write at the same time, 1 writes them one after another.
+output_workers = 4
 
-# Check if the path exists and set the file path, make it easier to switch between locations.
-try:
-    if Path(filePath).exists():
-        filePath = filePath
-        
-    elif Path(main_path_laptop).exists():
-        filePath = main_path_laptop
-    
-    elif Path(main_path_desktop).exists():
-        filePath = main_path_desktop
+# What the independent stages of the export run on, "thread" or "process".
+# Incremental export is only available with "thread".
+pipeline_executor = "thread"
 
-    print(f"Using the following Timetabling Location: {filePath}")
+# Run report of the time, CPU, rows and memory of each step of the export, set to a .json or .csv file to turn it on.
+instrumentation_report = None
 
-except: 
-    print("Timetabling Folder Can Not Be Found!")
-    sys.exit(1)
+# Also write cProfile stats and a tracemalloc snapshot next to the run report for a deep dive.
+instrumentation_profile = False
+
+# Incremental export, only rebuild and rewrite what has changed in the tfx files since the last export.
+# Rows that changed are added to the changes folder inside the output folder, delete it after uploading them.
+incremental_export = True
+
+# DataFrame library that builds the teachers, classes and enrolments, "pandas" or "polars" (pip install polars).
+# Both write the same import files, python backends.py checks that they do.
+backend = "pandas"
+
+# Stop the export before any import file is written if a validation check finds an error.
+# Every problem found is listed in Validation_Report.csv in the output folder either way.
+validation_fail_fast = False
 
-# Output Folder, if it exists, pass, else create it.
-if Path("schools_online_import_files").exists():
-    pass
-else:  
-    Path("schools_online_import_files").mkdir()
+# SQLite file a snapshot of every export is saved to, for looking back at past exports with snapshots.py.
+# Set to None to not save snapshots.
+snapshot_database = "schools_online_snapshots.sqlite"
+
+# Folder the teachers, classes and enrolments frames are saved to as Arrow files, for other tools to open with
+# frame_store.open_frames instead of reading the tfx files. Set to None to not save them (needs pip install pyarrow).
+frame_store_folder = None
 
 # Semester & Term file names
 semester1_tfx_file  = f"\\TTD_{year}_S1.tfx"
 semester2_tfx_file  = f"\\TTD_{year}_S2.tfx"
 
+
+def find_timetable_folder():
+    """
+    Finds the first of the timetable folders that exists.
+
+    Returns:
+    str: The folder, the first of timetable_folders if none of them exist.
+    """
+    for folder in timetable_folders:
+        if Path(folder).exists():
+            return folder
+    print("Timetabling Folder Can Not Be Found!")
+    return timetable_folders[0]
+
+
+def export_settings():
+    """
+    Collects the settings above into the arguments of create_files.export_school.
+
+    Returns:
+    dict: export_school argument name mapped to its value.
+    """
+    # Names used inside this file do not go through __getattr__, so filePath is looked up on the module
+    folder = globals()["filePath"] if "filePath" in globals() else __getattr__("filePath")
+    return {
+        "school_number": schoolNumber,
+        "year": year,
+        "semester1_tfx_path": f"{folder}{semester1_tfx_file}",
+        "semester2_tfx_path": f"{folder}{semester2_tfx_file}",
+        "output_folder": output_folder,
+        "output_workers": output_workers,
+        "incremental_export": incremental_export,
+        "executor": pipeline_executor,
+        "fail_fast": validation_fail_fast,
+        "backend": backend,
+        "snapshot_database": snapshot_database,
+        "frame_store_folder": frame_store_folder,
+    }
+
+
+def __getattr__(name):
+    # filePath is worked out the first time it is used rather than when config is imported
+    if name == "filePath":
+        global filePath
+        filePath = find_timetable_folder()
+        print(f"Using the following Timetabling Location: {filePath}")
+        return filePath
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,25 @@
-import json
+import os
+from functools import partial
+
+import numpy as np
 import pandas as pd
 import config
-
-
+from backends import get_backend
+from export_cache import ExportCache
+from frame_store import FrameStore
+from instrumentation import instrumentation, instrumented
+from import_writer import CLASS_FILES, ENROLMENT_FILES, partition, write_import_files
+from joins import inner_join
+from pipeline import Pipeline
+from schema import apply_schema, print_memory_savings, reset_memory_savings
+from snapshots import save_snapshot
+from rules import (CLASS_RESULTS_DUE_DEFAULT, CLASS_RESULTS_DUE_RULES, ENROLMENT_RESULTS_DUE_DEFAULT,
+                   ENROLMENT_RESULTS_DUE_RULES, apply_rules, teacher_codes)
+from tfx_model import TfxModel, copy_on_write, enable_copy_on_write
+from validation import VALIDATION_REPORT_FILE, error_count, validate, write_violations
+
+
+@instrumented
 def update_teacher_code(df):
     """
     Updates the Teacher Code column in the DataFrame to be in a format we want.    
@@ -14,16 +31,15 @@ def update_teacher_code(df):
         pd.DataFrame: The DataFrame with the updated 'Teacher Code' column.
     """
     ### This makes the teacher code to be the first 7 characters of the Given Names and the first character of the Family Name. ###
-    # print(df)
-    df["Teacher Code"] = df.apply(
-        lambda row: (row["Given Names"][:min(7, len(row["Given Names"]))] + row["Family Name"][0]), axis=1
-    )
+    df["Teacher Code"] = teacher_codes(df["Given Names"], df["Family Name"])
     return df
 
 
+@instrumented
 def generate_class_number(df):
     """
     Generates a Class Number for each unique ClassCode within groups defined by Stage, SACE Code, and Credits.
+    ClassCodes are numbered from 1 in the order they are first seen within their group.
 
     Parameters:
     df (pd.DataFrame): The input DataFrame with columns 'Stage', 'SACE Code', 'Credits', and 'ClassCode'.
@@ -31,71 +47,67 @@ def generate_class_number(df):
     Returns:
     pd.DataFrame: The DataFrame with an additional 'Sequence' column containing the sequence numbers.
     """
-    # Create a new column for the sequence
-    df['Sequence'] = 0
-    
-    # Group by SubjectCode
-    grouped = df.groupby(["Stage", "SACE Code", "Credits"])
-    
-    for name, group in grouped:
-        # Create a dictionary to store the sequence for each ClassCode
-        class_code_dict = {}
-        sequence = 1
-        
-        for index, row in group.iterrows():
-            class_code = row['ClassCode']
-            if class_code not in class_code_dict:
-                # print(class_code, sequence)
-                class_code_dict[class_code] = sequence
-                sequence += 1
-            df.at[index, 'Sequence'] = class_code_dict[class_code]
-    
+    group_keys = ["Stage", "SACE Code", "Credits"]
+
+    # Number the groups and the ClassCodes within them, sort=False numbers them in the order they are first seen
+    # Rows with a missing Stage, SACE Code or Credits are not in any group and get a group id of -1
+    # observed=True so categorical columns only number the groups that are in the DataFrame
+    group_ids = df.groupby(group_keys, sort=False, observed=True).ngroup().fillna(-1).to_numpy(dtype="int64")
+    class_ids = df.groupby(group_keys + ["ClassCode"], sort=False, observed=True, dropna=False).ngroup().to_numpy()
+
+    # The first row of each ClassCode takes the next number in its group, every other row copies that number
+    first_seen = ~pd.Series(class_ids).duplicated().to_numpy()
+    first_sequence = pd.Series(first_seen.astype("int64")).groupby(group_ids).cumsum().to_numpy()
+    class_sequence = np.zeros(class_ids.max() + 1 if len(class_ids) else 0, dtype="int64")
+    class_sequence[class_ids[first_seen]] = first_sequence[first_seen]
+
+    # Rows that are not in any group keep a Sequence of 0
+    df['Sequence'] = np.where(group_ids >= 0, class_sequence[class_ids], 0)
+
     return df
 
 
-def get_enrollments(tfx_file, semester, swd=False):
+@instrumented
+def get_enrollments(tfx_file, semester, school_number, year, swd=False):
     """
     Gets the Exploring Identities and Futures Enrollments from the Timetable Development File and puts it into the required format for Schools Online
     
     Parameters:
-    tfx_file (dict): The JSON Semester Timetable Development (tfx) file.
+    tfx_file (TfxModel): The parsed Semester Timetable Development (tfx) file.
+    semester (int): The semester number.
+    school_number (int): The Schools Online school number.
+    year (int): The year of the enrolments.
+    swd (bool): Boolean to get the SWD enrolments instead of the mainstream enrolments.
 
     Returns:
     pd.DataFrame: Dataframe containing all AIF Enrollment..
     """
-    # Grab the JSON records from the tfx files
-    class_names_df = pd.json_normalize(tfx_file, record_path="ClassNames")
-    class_names_df.rename(columns={"Code": "ClassCode"}, inplace=True) # Rename to match student information
-    timetable_df = pd.json_normalize(tfx_file, record_path="Timetable")
-    teacher_df = pd.json_normalize(tfx_file, record_path="Teachers")
-    students_df = pd.json_normalize(tfx_file, record_path="Students")
-    
-    # Expand out the student lessons JSON into columns, each students subjects are listed in JSON format under the StudentLessons field
-    students_df = students_df.explode("StudentLessons")
-    json_df = pd.json_normalize(students_df["StudentLessons"])
-    # Combine back into the student dataframe
-    students_df = pd.concat([students_df.drop(columns=["StudentLessons"]).reset_index(drop=True), json_df[["ClassCode"]]], axis=1)
-
-    # Remove unwanted columns
-    for col in students_df.columns:
-        if col not in ["Code", "ClassCode", "BOSCode"]:
-            students_df.drop(col, axis=1, inplace=True)
-    
-    # Merge Dataframes together to get required information for Schools Online    
-    students_df = pd.merge(students_df, class_names_df[["ClassCode", "ClassNameID", "BOSClassCode1"]], on="ClassCode")
-    students_df = pd.merge(students_df, timetable_df[["ClassNameID", "TeacherID"]], on="ClassNameID")
-    students_df = pd.merge(students_df, teacher_df[["TeacherID", "Code"]], on="TeacherID")
-
-    students_df.drop_duplicates(ignore_index=True, inplace=True)
-
-    # Drop any students with no BOSClassCode1 - This should be all classes and students who are not studying SACE subjects.
-    students_df.dropna(subset=["BOSClassCode1"], inplace=True)
-
+    # Grab the records from the tfx file sections
+    class_names_df = tfx_file["ClassNames"].rename(columns={"Code": "ClassCode"}) # Rename to match student information
+    timetable_df = tfx_file["Timetable"]
+    teacher_df = tfx_file["Teachers"].rename(columns={"Code": "TeacherCode"}) # Rename so it does not clash with the student Code
+    # The loader has already expanded the StudentLessons, one row per student lesson with the lesson ClassCode
+    students_df = tfx_file["Students"]
+
+    # Remove unwanted columns and repeated student lessons
+    students_df = students_df[[col for col in students_df.columns if col in ["Code", "ClassCode", "BOSCode"]]].drop_duplicates(ignore_index=True)
+
+    # Only keep the classes we want before joining anything to them, classes with no BOSClassCode1 are not SACE subjects
+    class_names_df = class_names_df[["ClassCode", "ClassNameID", "BOSClassCode1"]].dropna(subset=["BOSClassCode1"])
     # Filter for SWD or Mainstream Enrollments
     if swd == True:
-        students_df = students_df[students_df["BOSClassCode1"].str.contains("SWD")]
+        class_names_df = class_names_df[class_names_df["BOSClassCode1"].str.contains("SWD")]
     else:
-        students_df = students_df[~students_df["BOSClassCode1"].str.contains("SWD")]
+        class_names_df = class_names_df[~class_names_df["BOSClassCode1"].str.contains("SWD")]
+    class_names_df = class_names_df.drop_duplicates(ignore_index=True)
+
+    # Each class teacher once, a class has a row in the timetable for every period it is taught
+    class_teachers_df = timetable_df[["ClassNameID", "TeacherID"]].drop_duplicates(ignore_index=True)
+    class_teachers_df = inner_join(class_teachers_df, teacher_df[["TeacherID", "TeacherCode"]], on="TeacherID").drop_duplicates(ignore_index=True)
+
+    # Join the small lookup tables to the student lessons, team taught classes give a row for each teacher
+    students_df = inner_join(students_df, class_names_df, on="ClassCode")
+    students_df = inner_join(students_df, class_teachers_df, on="ClassNameID")
 
     student_enrollments_df = pd.DataFrame()
     try:
@@ -103,8 +115,8 @@ def get_enrollments(tfx_file, semester, swd=False):
     except KeyError:
         student_enrollments_df["Registration Number"] = ""
         print("No BOSCode found in tfx file, leaving Registration Number blank in Enrollments Import File.")
-    student_enrollments_df["Student Code"] = students_df["Code_x"]
-    student_enrollments_df["Year"] = config.year
+    student_enrollments_df["Student Code"] = students_df["Code"]
+    student_enrollments_df["Year"] = year
     student_enrollments_df["Semester"] = semester
     student_enrollments_df["Stage"] = pd.to_numeric(students_df["BOSClassCode1"].str.slice(stop=1), errors='coerce')
     student_enrollments_df["SACE Code"] = students_df["BOSClassCode1"].str.slice(start=1, stop=4)
@@ -112,44 +124,38 @@ def get_enrollments(tfx_file, semester, swd=False):
     student_enrollments_df["Enrolment Number"] = ""
     
     student_enrollments_df["Program Variant"] = ""
-    student_enrollments_df["Teaching School Number"] = config.schoolNumber
-    student_enrollments_df["Assessment School Number"] = config.schoolNumber
+    student_enrollments_df["Teaching School Number"] = school_number
+    student_enrollments_df["Assessment School Number"] = school_number
     
     student_enrollments_df["Enrolment Status"] = "E"
     student_enrollments_df["Repeat Indicator"] = "N"
     student_enrollments_df["ClassCode"] = students_df["ClassCode"]
     student_enrollments_df["Stage 1 Grade"] = ""
     student_enrollments_df["Partial Credits"] = ""
-    student_enrollments_df["ED ID"] = students_df["Code_x"]
+    student_enrollments_df["ED ID"] = students_df["Code"]
 
 
-    student_enrollments_df.insert(0, "Contact School Number", config.schoolNumber)
+    student_enrollments_df.insert(0, "Contact School Number", school_number)
     student_enrollments_df.insert(9,
                               "Results Due",
-                              student_enrollments_df.apply(
-                                lambda row: (
-                                    'D' if "SWD" in row["ClassCode"] else
-                                    'J' if row['Semester'] == 1 else  # Stage 1, Semester 1
-                                    'D' if row['Semester'] == 2 else  # Stage 1, Semester 2
-                                    'CHECK!'
-                                ),
-                                axis=1
-                                )
+                              apply_rules(student_enrollments_df, ENROLMENT_RESULTS_DUE_RULES, ENROLMENT_RESULTS_DUE_DEFAULT)
     )
     student_enrollments_df.insert(13, "Class Number", generate_class_number(student_enrollments_df)["Sequence"])
     student_enrollments_df.rename(columns={"ClassCode": "School Class Code"}, inplace=True)
 
     student_enrollments_df.drop(columns=["Sequence"], axis=1, inplace=True)
 
-    return student_enrollments_df
+    return apply_schema(student_enrollments_df, "enrolments")
 
 
-def organise_teachers_df(df):
+@instrumented
+def organise_teachers_df(df, school_number):
     """
     Organises the teachers DataFrame into the Format required by Schools Online.
 
     Parameters:
     df (pd.DataFrame): The input DataFrame containing teacher information.
+    school_number (int): The Schools Online school number.
 
     Returns:
     pd.DataFrame: The organized DataFrame with the required columns.
@@ -161,7 +167,7 @@ def organise_teachers_df(df):
     organised_df = pd.DataFrame()
 
     organised_df["TeacherID"] = df["TeacherID"]
-    organised_df["Contact School Number"] = config.schoolNumber
+    organised_df["Contact School Number"] = school_number
     organised_df["TeacherCode"] = df["Code"]
     organised_df["Family Name"] = df["LastName"]
     organised_df["Initials"] = df["FirstName"].str[0]
@@ -176,43 +182,49 @@ def organise_teachers_df(df):
     return organised_df
     
 
-def get_teachers_dataframe(sem1_tfx, sem2_tfx):
+@instrumented
+def get_teachers_dataframe(sem1_tfx, sem2_tfx, school_number):
     """
     Combines teacher data from two semesters, organises it, removes duplicates, and renames columns.
 
     Parameters:
-    sem1_tfx (dict): The JSON Semester 1 Timetable Development (tfx) file.
-    sem2_tfx (dict): The JSON Semester 2 Timetable Development (tfx) file.
+    sem1_tfx (TfxModel): The parsed Semester 1 Timetable Development (tfx) file.
+    sem2_tfx (TfxModel): The parsed Semester 2 Timetable Development (tfx) file.
+    school_number (int): The Schools Online school number.
 
     Returns:
     pd.DataFrame: The combined and organized DataFrame with teacher information.
     """
-    sem1_teachers_df = pd.json_normalize(sem1_tfx, record_path="Teachers")
-    sem2_teachers_df = pd.json_normalize(sem2_tfx, record_path="Teachers")
+    sem1_teachers_df = sem1_tfx["Teachers"]
+    sem2_teachers_df = sem2_tfx["Teachers"]
 
-    teachers_df = pd.concat([organise_teachers_df(sem1_teachers_df), organise_teachers_df(sem2_teachers_df)])
+    teachers_df = pd.concat([organise_teachers_df(sem1_teachers_df, school_number), organise_teachers_df(sem2_teachers_df, school_number)])
 
     teachers_df = teachers_df.drop_duplicates()
     
     teachers_df.rename(columns={'TeacherCode': "Teacher Code"}, inplace=True)
 
-    return teachers_df
+    return apply_schema(teachers_df, "teachers")
 
 
-def classes_import_dataframe(teacher_df, classes_tfx, semester, msswd="ms"):
+@instrumented
+def classes_import_dataframe(teacher_df, classes_tfx, semester, school_number, year, msswd="ms"):
     """
     Organises the classes DataFrame by merging teacher and class information, filtering, and adding necessary columns as required for the Classes Import File for Schools Online.
 
     Parameters:
     teacher_df (pd.DataFrame): DataFrame containing teacher information.
-    classes_tfx (dict): The Timetable Development file (tfx)
+    classes_tfx (TfxModel): The parsed Timetable Development file (tfx)
     semester (int): The semester number.
+    school_number (int): The Schools Online school number.
+    year (int): The year of the classes.
+    msswd (str): "swd" for the SWD classes, otherwise the mainstream classes.
 
     Returns:
     pd.DataFrame: The organised DataFrame with class information.
     """
-    classes_df = pd.json_normalize(classes_tfx, record_path="ClassNames")
-    timetable_df = pd.json_normalize(classes_tfx, record_path="Timetable")
+    classes_df = classes_tfx["ClassNames"]
+    timetable_df = classes_tfx["Timetable"]
 
     # Merge the two dataframes to from the tfx file information
     teachers_classes_df = pd.merge(teacher_df, timetable_df, how='left', on="TeacherID")
@@ -238,35 +250,25 @@ def classes_import_dataframe(teacher_df, classes_tfx, semester, msswd="ms"):
     organised_classes_df["Stage"] = teachers_class_details_df["BOSClassCode1"].str.slice(stop=1)
     organised_classes_df["SACE Code"] = teachers_class_details_df["BOSClassCode1"].str.slice(start=1, stop=4)
     organised_classes_df["Credits"] = teachers_class_details_df["BOSClassCode1"].str.slice(start=4, stop=6)
-    organised_classes_df["Class Number"] = "" # Leave blank and match up by Code Afterwards
+    organised_classes_df["Class Number"] = pd.NA # Leave blank and match up by Code Afterwards
     organised_classes_df["Program Variant"] = ""
     organised_classes_df["Semester"] = semester
     organised_classes_df["Teacher Code"] = teachers_class_details_df["Teacher Code"]
 
     organised_classes_df["School Class Code"] = teachers_class_details_df["Code"]
-    organised_classes_df["Results Due"] = organised_classes_df.apply(
-        lambda row: (
-            'D' if row['Credits'] == "20" else
-            'D' if msswd == "swd" else
-            'J' if row['Semester'] == 1 and row['Stage'] == "1" else  # Stage 1, Semester 1
-            'D' if row['Semester'] == 2 and row['Stage'] == "1" else  # Stage 1, Semester 2
-            'J' if row['SACE Code'] in ['RPA', 'RPM', 'AIF', 'AIM'] and row['Semester'] == 1 else  # Stage 2, Semester 1 for special codes
-            'D' if row['SACE Code'] in ['RPA', 'RPM', 'AIF', 'AIM'] and row['Semester'] == 2 else  # Stage 2, Semester 2 for special codes
-            'D'  # Default return for all other Stage 2 subjects
-        ),
-        axis=1
-    )
+    organised_classes_df["Results Due"] = apply_rules(organised_classes_df, CLASS_RESULTS_DUE_RULES, CLASS_RESULTS_DUE_DEFAULT, swd=msswd == "swd")
     # Have to put these at the end as they are static values to be filled in
-    organised_classes_df["Contact School Number"] = config.schoolNumber
-    organised_classes_df["Year"] = config.year
+    organised_classes_df["Contact School Number"] = school_number
+    organised_classes_df["Year"] = year
 
     # Move the 2 columns to the front
     organised_classes_df.insert(0, "Contact School Number", organised_classes_df.pop("Contact School Number"))
     organised_classes_df.insert(1, "Year", organised_classes_df.pop("Year"))
 
-    return organised_classes_df
+    return apply_schema(organised_classes_df, "classes")
 
 
+@instrumented
 def get_only_sace_teachers(teacher_df, classes_df):
     """
     Filters the teacher DataFrame to include only those who are teaching SACE classes.
@@ -284,138 +286,349 @@ def get_only_sace_teachers(teacher_df, classes_df):
     sace_teachers_df.drop(columns=["TeacherID", "Year"], axis=1, inplace=True)
     sace_teachers_df.drop_duplicates(ignore_index=True, inplace=True)
 
-    return sace_teachers_df
+    return apply_schema(sace_teachers_df, "teachers")
+
 
+### PIPELINE STAGES ###
+# Each stage of the export is a function of the stages it depends on, export_school runs them as a pipeline.
 
-def check_multiple_teachers(df):
+
+@instrumented
+def load_semester(tfx_path, export_cache):
     """
-    Checks if there are any classes with multiple teachers.
+    Opens a semester tfx file and works out the hashes of its sections.
 
     Parameters:
-    df (pd.DataFrame): The input DataFrame containing class information
+    tfx_path (str): Path to the tfx file.
+    export_cache (ExportCache): The incremental export cache.
 
     Returns:
-    df (pd.DataFrame)
+    tuple: (TfxModel, dict of section hashes)
     """
-    # Find duplicate School Class Codes and export to a csv.
-    duplicates = df[df.duplicated(subset=["School Class Code"], keep=False)]
-    if len(duplicates) > 0:
-        return duplicates
-    else:
-        pass
+    tfx_model = TfxModel(tfx_path)
+    if not export_cache.enabled:
+        # Without the cache every later stage needs the sections, parse them here once
+        tfx_model.load()
+    return tfx_model, export_cache.section_hashes(tfx_model)
 
 
-def classes_file_output(df, semester, stage, swd=False):
+@instrumented
+def build_teachers(semester1, semester2, school_number, year, export_cache, backend, frame_store):
     """
-    Outputs the classes DataFrame to a CSV file and does some sanity checks along the way.
+    Builds the teachers DataFrame from both semesters, or takes it from the cache if neither has changed.
 
     Parameters:
-    df (pd.DataFrame): The input DataFrame containing class information.
+    semester1 (tuple): The load_semester result for Semester 1.
+    semester2 (tuple): The load_semester result for Semester 2.
+    school_number (int): The Schools Online school number.
+    year (int): The year being exported.
+    export_cache (ExportCache): The incremental export cache.
+    backend (PandasBackend or PolarsBackend): The backend that builds the frame.
+    frame_store (FrameStore): The store the frame is saved to for other tools.
+
+    Returns:
+    tuple: (teachers DataFrame, list of the cache inputs it was built from)
+    """
+    (semester1_tfx, semester1_hashes), (semester2_tfx, semester2_hashes) = semester1, semester2
+    teachers_inputs = [year, school_number, semester1_hashes["Teachers"], semester2_hashes["Teachers"]]
+    # A frame opened from the frame store skips the cache, its cached copy is marked as used so it is kept
+    export_cache.keep("teachers", teachers_inputs)
+    teachers_df = frame_store.frame("teachers", lambda: export_cache.frame("teachers", teachers_inputs, lambda: backend.teachers(semester1_tfx, semester2_tfx, school_number)))
+    return teachers_df, teachers_inputs
+
+
+@instrumented
+def build_enrolments(semester_data, semester, school_number, year, export_cache, backend, frame_store, swd=False):
+    """
+    Builds the enrolments DataFrame for one semester, or takes it from the cache if the semester has not changed.
+
+    Parameters:
+    semester_data (tuple): The load_semester result for the semester.
     semester (int): The semester number.
-    stage (int): The stage number.
-    swd (bool): Boolean to indicate if the classes are for SWD students.
+    school_number (int): The Schools Online school number.
+    year (int): The year being exported.
+    export_cache (ExportCache): The incremental export cache.
+    backend (PandasBackend or PolarsBackend): The backend that builds the frame.
+    frame_store (FrameStore): The store the frame is saved to for other tools.
+    swd (bool): Boolean to build the SWD enrolments instead of the mainstream enrolments.
 
     Returns:
-    None
-    """
-    # Code Length Check if School Class Code is greater than 10 characters
-    good_codes = True
-    for row in df.iterrows():
-        if len(row[1]["School Class Code"]) > 10:
-            print(f"Class Code: {row[1]['School Class Code']} is greater than 10 characters!")
-            good_codes = False
-    
-    if good_codes:
-        print("All Class Codes are good! Clear to Upload Classes File!")
-    else:
-        print("Please update class codes to be less than 10 characters!")
-    
-    # Output to CSV
-    df = df[df["Stage"] == str(stage)]
-    if stage == "1":
-        if swd == True:
-            df.to_csv(f'schools_online_import_files\\SWD_Stage{stage}_S{semester}_CLASSIMP.csv', index=False)
-        else:
-            df.to_csv(f'schools_online_import_files\\Stage{stage}_S{semester}_CLASSIMP.csv', index=False)
-    else:
-        if swd == True:
-            df.to_csv(f'schools_online_import_files\\SWD_Stage{stage}_CLASSIMP.csv', index=False)
-        else:
-            df.to_csv(f'schools_online_import_files\\Stage{stage}_CLASSIMP.csv', index=False)
+    pd.DataFrame: The enrolments for the semester.
+    """
+    tfx_model, hashes = semester_data
+    name = f"enrolments S{semester}{' SWD' if swd else ''}"
+    inputs = [year, school_number] + list(hashes.values())
+    export_cache.keep(name, inputs)
+    return frame_store.frame(name, lambda: export_cache.frame(name, inputs, lambda: backend.enrolments(tfx_model, semester, school_number, year, swd)))
 
 
-### CODE START ###
+@instrumented
+def build_classes(teachers, semester_data, semester, school_number, year, export_cache, backend, frame_store, msswd="ms"):
+    """
+    Builds the classes DataFrame for one semester, or takes it from the cache if its inputs have not changed.
+
+    Parameters:
+    teachers (tuple): The build_teachers result.
+    semester_data (tuple): The load_semester result for the semester.
+    semester (int): The semester number.
+    school_number (int): The Schools Online school number.
+    year (int): The year being exported.
+    export_cache (ExportCache): The incremental export cache.
+    backend (PandasBackend or PolarsBackend): The backend that builds the frame.
+    frame_store (FrameStore): The store the frame is saved to for other tools.
+    msswd (str): "swd" for the SWD classes, otherwise the mainstream classes.
+
+    Returns:
+    pd.DataFrame: The classes for the semester.
+    """
+    (teachers_df, teachers_inputs), (tfx_model, hashes) = teachers, semester_data
+    name = f"classes S{semester}{' SWD' if msswd == 'swd' else ''}"
+    inputs = teachers_inputs + [hashes["ClassNames"], hashes["Timetable"]]
+    export_cache.keep(name, inputs)
+    return frame_store.frame(name, lambda: export_cache.frame(name, inputs, lambda: backend.classes(teachers_df, tfx_model, semester, school_number, year, msswd)))
+
+
+@instrumented
+def merge_semesters(semester1_enrollments, semester2_enrollments, semester1_classes_import, semester2_classes_import):
+    """
+    Combines the two semesters and matches up the Class Number of each class with its enrolments.
 
-# Open Files
-with open (f"{config.filePath}{config.semester1_tfx_file}", "r") as semester1_tfx_file:
-    semester1_tfx = json.load(semester1_tfx_file)
+    Parameters:
+    semester1_enrollments (pd.DataFrame): The Semester 1 enrolments.
+    semester2_enrollments (pd.DataFrame): The Semester 2 enrolments.
+    semester1_classes_import (pd.DataFrame): The Semester 1 classes.
+    semester2_classes_import (pd.DataFrame): The Semester 2 classes.
+
+    Returns:
+    tuple: (all enrolments DataFrame, classes import DataFrame)
+    """
+    all_enrollments = pd.concat([semester1_enrollments, semester2_enrollments])
+
+    classes_import = pd.concat([semester1_classes_import, semester2_classes_import])
+    classes_import.drop_duplicates(subset=["Teacher Code", "School Class Code"], ignore_index=True, inplace=True)
+
+    # Match up Class Number in Enrollments with Classes by merging on School Class Code, then drop duplicates
+    classes_import = pd.merge(classes_import.drop(columns=['Class Number']), all_enrollments[["School Class Code", "Class Number"]].drop_duplicates(), how='left', on=["School Class Code"])
+    classes_import.drop_duplicates(ignore_index=True, inplace=True)
+
+    # Move Class Number to column 4 (index 3) and shift other columns
+    class_number_col = classes_import.pop('Class Number')
+    classes_import.insert(5, 'Class Number', class_number_col)
+
+    # Joining the semesters turns categoricals with different categories back into Python strings
+    return apply_schema(all_enrollments, "enrolments"), apply_schema(classes_import, "classes")
+
+
+@instrumented
+def validate_export(teachers, merged, output_folder, fail_fast=False):
+    """
+    Runs the Schools Online checks on the final frames before anything is written.
+
+    Parameters:
+    teachers (tuple): The build_teachers result.
+    merged (tuple): The merge_semesters result.
+    output_folder (str): Folder the Validation_Report.csv and Duplicate_Classes.csv files are written to.
+    fail_fast (bool): Stop the export before any import file is written if a check finds an error.
+
+    Returns:
+    tuple: (all enrolments DataFrame, classes import DataFrame, SACE teachers DataFrame, violations DataFrame)
+    """
+    teachers_df, _ = teachers
+    all_enrollments, classes_import = merged
+
+    # Only the teachers of SACE classes go in the Teacher import file
+    sace_teachers_df = get_only_sace_teachers(teachers_df, classes_import)
+
+    violations = validate({"teachers": sace_teachers_df, "classes": classes_import, "enrolments": all_enrollments})
+    write_violations(violations, output_folder)
 
-with open (f"{config.filePath}{config.semester2_tfx_file}", "r") as semester2_tfx_file:
-    semester2_tfx = json.load(semester2_tfx_file)
+    # Check for multiple teachers
+    duplicate_rows = violations.loc[violations["Rule"] == "multiple_teachers", "Row"]
+    if len(duplicate_rows) > 0:
+        classes_import.iloc[np.sort(duplicate_rows.to_numpy())].to_csv(os.path.join(output_folder, "Duplicate_Classes.csv"), index=False)
+        print("Duplicate Classes Found! Check Duplicate_Classes.csv for more information. Team Teachers???")
 
-# Get Teachers Dataframe
-teachers_df = get_teachers_dataframe(semester1_tfx, semester2_tfx)
+    errors = error_count(violations)
+    if fail_fast and errors > 0:
+        raise ValueError(f"{errors} validation errors found, no import files were written. See {VALIDATION_REPORT_FILE} for every row.")
 
-# # Get Enrollments Dataframes
-semester1_enrollments = get_enrollments(semester1_tfx, 1) # Semester 1
-semester2_enrollments = get_enrollments(semester2_tfx, 2) # Semester 2
-all_enrollments = pd.concat([semester1_enrollments, semester2_enrollments])
-# semester1_enrollments_swd = get_enrollments(semester1_tfx, 1, True) # Semester 1 SWD
-# semester2_enrollments_swd = get_enrollments(semester2_tfx, 2, True) # Semester 2 SWD
-# all_enrollments_swd = pd.concat([semester1_enrollments_swd, semester2_enrollments_swd])
+    return all_enrollments, classes_import, sace_teachers_df, violations
 
-# # Get Classes Dataframes
-semester1_classes_import = classes_import_dataframe(teachers_df, semester1_tfx, 1)
-semester2_classes_import = classes_import_dataframe(teachers_df, semester2_tfx, 2)
-classes_import = pd.concat([semester1_classes_import, semester2_classes_import])
-classes_import.drop_duplicates(subset=["Teacher Code", "School Class Code"], ignore_index=True, inplace=True)
 
-# Match up Class Number in Enrollments with Classes by merging on School Class Code, then drop duplicates
-classes_import = pd.merge(classes_import.drop(columns=['Class Number']), all_enrollments[["School Class Code", "Class Number"]].drop_duplicates(), how='left', on=["School Class Code"])
-classes_import.drop_duplicates(ignore_index=True, inplace=True)
+@instrumented
+def write_export(validated, output_folder, output_workers, export_cache):
+    """
+    Writes the Teacher, Classes and Enrolments import files.
+
+    Parameters:
+    validated (tuple): The validate_export result.
+    output_folder (str): The output folder.
+    output_workers (int): Number of import files to write at the same time.
+    export_cache (ExportCache): The incremental export cache.
 
-# Move Class Number to column 4 (index 3) and shift other columns
-class_number_col = classes_import.pop('Class Number')
-classes_import.insert(5, 'Class Number', class_number_col)
+    Returns:
+    dict: File name mapped to the DataFrame written.
+    """
+    all_enrollments, classes_import, sace_teachers_df, _ = validated
 
-print(classes_import)
+    # Every import file is split out of its frame with one groupby then written in a single pass
+    output_files = {"TeacherImport.csv": sace_teachers_df}
+    output_files.update(partition(classes_import, CLASS_FILES))
+    output_files.update(partition(all_enrollments, ENROLMENT_FILES))
 
-# semester1_classes_import_swd = classes_import_dataframe(teachers_df, semester1_tfx, 1, "swd")
-# semester2_classes_import_swd = classes_import_dataframe(teachers_df, semester2_tfx, 2, "swd")
-# classes_import_swd = pd.concat([semester1_classes_import_swd, semester2_classes_import_swd])
-# classes_import_swd.drop_duplicates(subset=["Teacher Code", "School Class Code"], ignore_index=True, inplace=True)
+    write_import_files(output_files, output_folder, output_workers, export_cache)
+    export_cache.save()
 
+    return output_files
 
-# # Check for multiple teachers
-mutiple_teacher_check = check_multiple_teachers(pd.concat([classes_import]))
-if mutiple_teacher_check is not None:
-    mutiple_teacher_check.to_csv("schools_online_import_files\\Duplicate_Classes.csv", index=False)
-    print("Duplicate Classes Found! Check Duplicate_Classes.csv for more information. Team Teachers???")
 
-# Get all classes for Teachers
-# all_enrollments = pd.concat([all_enrollments, all_enrollments_swd])
-all_classes = pd.concat([classes_import])
+@instrumented
+def snapshot_export(semester1, semester2, validated, school_number, year, snapshot_database):
+    """
+    Saves what this export read and wrote to the snapshot database. A snapshot that can not be saved does not stop the
+    export, the import files are written either way.
+
+    Parameters:
+    semester1 (tuple): The load_semester result for Semester 1.
+    semester2 (tuple): The load_semester result for Semester 2.
+    validated (tuple): The validate_export result.
+    school_number (int): The Schools Online school number.
+    year (int): The year being exported.
+    snapshot_database (str): Path to the SQLite snapshot database.
+
+    Returns:
+    int: The id of the snapshot, None if it could not be saved.
+    """
+    all_enrollments, classes_import, sace_teachers_df, _ = validated
+    frames = {"teachers": sace_teachers_df, "classes": classes_import, "enrolments": all_enrollments}
+    try:
+        snapshot_id = save_snapshot(snapshot_database, school_number, year, {1: semester1, 2: semester2}, frames)
+    except Exception as error:
+        print(f"Could not save a snapshot to {snapshot_database}: {error}")
+        return None
+    print(f"Saved snapshot {snapshot_id} to {snapshot_database}")
+    return snapshot_id
+
+
+### CODE START ###
+
+
+@instrumented
+def export_school(school_number, year, semester1_tfx_path, semester2_tfx_path, output_folder, output_workers=1, incremental_export=True, executor="thread", fail_fast=False, validate_only=False, backend="pandas", snapshot_database=None, frame_store_folder=None):
+    """
+    Exports the Schools Online import files for one school from its Semester 1 and Semester 2 tfx files.
+
+    Parameters:
+    school_number (int): The Schools Online school number.
+    year (int): The year being exported.
+    semester1_tfx_path (str): Path to the Semester 1 tfx file.
+    semester2_tfx_path (str): Path to the Semester 2 tfx file.
+    output_folder (str): Folder the import files are written to, created if it does not exist.
+    output_workers (int): Number of import files to write at the same time.
+    incremental_export (bool): Only rebuild and rewrite what has changed since the last export to this folder.
+    executor (str): "thread" or "process", what the independent stages of the pipeline run on.
+    fail_fast (bool): Stop before any import file is written if validation finds an error.
+    validate_only (bool): Run the checks and write the Validation_Report.csv without writing the import files.
+    backend (str): "pandas" or "polars", the DataFrame library that builds the teachers, classes and enrolments.
+    snapshot_database (str): SQLite file a snapshot of the export is saved to, None to not save one.
+    frame_store_folder (str): Folder the teachers, classes and enrolments frames are saved to as Arrow files for other
+        tools, None to not save them.
+
+    Returns:
+    dict: Summary of the export with the number of enrolment, class and teacher rows and validation errors.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+
+    # The cache keeps track of what it has used in this process, so it can only be used when the stages run on threads
+    if executor == "process" and incremental_export:
+        print("Incremental export is not available when running stages in processes, exporting everything.")
+        incremental_export = False
+
+    # Validating leaves the cache and changes folder of the last export alone
+    if validate_only:
+        incremental_export = False
+
+    # Derived frames are only rebuilt when the tfx sections they are made from have changed since the last export
+    export_cache = ExportCache(output_folder, incremental_export)
+    # Frames saved for other tools are opened instead of built when the tfx files have not changed
+    frame_store = FrameStore(frame_store_folder, semester1_tfx_path, semester2_tfx_path, school_number, year)
+    reset_memory_savings()
+    school = {"school_number": school_number, "year": year, "export_cache": export_cache, "backend": get_backend(backend), "frame_store": frame_store}
+
+    # load -> teachers -> enrolments / classes per semester -> merge -> validate -> write and snapshot
+    pipeline = Pipeline()
+    pipeline.add("load S1", partial(load_semester, semester1_tfx_path, export_cache))
+    pipeline.add("load S2", partial(load_semester, semester2_tfx_path, export_cache))
+    pipeline.add("teachers", partial(build_teachers, **school), ["load S1", "load S2"])
+    pipeline.add("enrolments S1", partial(build_enrolments, semester=1, **school), ["load S1"])
+    pipeline.add("enrolments S2", partial(build_enrolments, semester=2, **school), ["load S2"])
+    pipeline.add("classes S1", partial(build_classes, semester=1, **school), ["teachers", "load S1"])
+    pipeline.add("classes S2", partial(build_classes, semester=2, **school), ["teachers", "load S2"])
+    # pipeline.add("enrolments S1 SWD", partial(build_enrolments, semester=1, swd=True, **school), ["load S1"])
+    # pipeline.add("enrolments S2 SWD", partial(build_enrolments, semester=2, swd=True, **school), ["load S2"])
+    # pipeline.add("classes S1 SWD", partial(build_classes, semester=1, msswd="swd", **school), ["teachers", "load S1"])
+    # pipeline.add("classes S2 SWD", partial(build_classes, semester=2, msswd="swd", **school), ["teachers", "load S2"])
+    pipeline.add("merge", merge_semesters, ["enrolments S1", "enrolments S2", "classes S1", "classes S2"])
+    pipeline.add("validate", partial(validate_export, output_folder=output_folder, fail_fast=fail_fast), ["teachers", "merge"])
+    if not validate_only:
+        pipeline.add("write", partial(write_export, output_folder=output_folder, output_workers=output_workers, export_cache=export_cache), ["validate"])
+        if snapshot_database:
+            pipeline.add("snapshot", partial(snapshot_export, school_number=school_number, year=year, snapshot_database=snapshot_database), ["load S1", "load S2", "validate"])
+
+    # The stages share the TfxModel frames, worker processes turn Copy-on-Write on for themselves
+    with copy_on_write():
+        results = pipeline.run(executor, initializer=enable_copy_on_write)
+    pipeline.print_timings()
+
+    # The models are only shared between stages when they run on threads
+    if executor == "thread":
+        semester1_tfx, _ = results["load S1"]
+        semester2_tfx, _ = results["load S2"]
+        print(f"Semester 1 tfx: {semester1_tfx.summary()}")
+        print(f"Semester 2 tfx: {semester2_tfx.summary()}")
+        if frame_store.enabled:
+            print(f"Frame store opened: {', '.join(frame_store.reused) or 'none'}, saved: {', '.join(frame_store.built) or 'none'}")
+        print_memory_savings()
+
+    all_enrollments, classes_import, sace_teachers_df, violations = results["validate"]
+    return {
+        "school_number": school_number,
+        "year": year,
+        "enrolments": len(all_enrollments),
+        "classes": len(classes_import),
+        "teachers": len(sace_teachers_df),
+        "errors": error_count(violations),
+    }
+
+
+def main(**overrides):
+    """
+    Exports the import files for the school set up in config.py.
+
+    Parameters:
+    **overrides: export_school arguments to use instead of the config.py settings, such as validate_only=True.
+
+    Returns:
+    dict: The export_school summary.
+    """
+    settings = config.export_settings()
+    settings.update(overrides)
 
-### OUTPUT FILES ###
-# Teachers
-get_only_sace_teachers(teachers_df, all_classes).to_csv("schools_online_import_files\\TeacherImport.csv", index=False)
+    if config.instrumentation_report:
+        instrumentation.enable(profile=config.instrumentation_profile)
 
-# Classes
-classes_file_output(classes_import[(classes_import["Semester"] == 1)], 1, "1")
-classes_file_output(classes_import[(classes_import["Semester"] == 2)], 2, "1")
-classes_file_output(classes_import, 1, "2")
+    summary = export_school(**settings)
 
-# classes_file_output(classes_import_swd, 1, "1", True)
-# classes_file_output(classes_import_swd, 2, "1", True)
-# classes_file_output(classes_import_swd, 1, "2", True)
+    if config.instrumentation_report:
+        instrumentation.print_report()
+        instrumentation.write_report(config.instrumentation_report)
+        if config.instrumentation_profile:
+            instrumentation.dump_profile(os.path.splitext(config.instrumentation_report)[0])
+        instrumentation.disable()
+    # print("Done!")
 
-# Enrollments
-all_enrollments[(all_enrollments["Semester"] == 1) & (all_enrollments["Stage"] == 1)].to_csv('schools_online_import_files\\Stage1_S1_ENRLIMP.csv', index=False)
-all_enrollments[(all_enrollments["Semester"] == 2) & (all_enrollments["Stage"] == 1)].to_csv('schools_online_import_files\\Stage1_S2_ENRLIMP.csv', index=False)
-all_enrollments[(all_enrollments["Semester"] == 1) & (all_enrollments["Stage"] == 2)].to_csv('schools_online_import_files\\Stage2_S1_ENRLIMP.csv', index=False)
+    return summary
 
-# all_enrollments_swd[(all_enrollments_swd["Semester"] == 1) & (all_enrollments_swd["Stage"] == 1)].to_csv('schools_online_import_files\\SWD_Stage1_S1_ENRLIMP.csv', index=False)
-# all_enrollments_swd[(all_enrollments_swd["Semester"] == 2) & (all_enrollments_swd["Stage"] == 1)].to_csv('schools_online_import_files\\SWD_Stage1_S2_ENRLIMP.csv', index=False)
-# all_enrollments_swd[(all_enrollments_swd["Semester"] == 1) & (all_enrollments_swd["Stage"] == 2)].to_csv('schools_online_import_files\\SWD_Stage2_S1_ENRLIMP.csv', index=False)
 
-# print("Done!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import pickle
+from collections import Counter
+
+### Incremental Export Cache ###
+# Keeps the derived frames of the last exports in the output folder, keyed by hashes of the tfx sections they were
+# built from, so a re-run after a small edit only rebuilds what the edit touched. Import files whose contents have
+# not changed are not rewritten, and the rows that did change are written to the changes folder for re-uploading.
+# The changes folder keeps adding up the changes of each export until it is deleted after uploading them.
+
+CACHE_FOLDER = ".cache"
+CHANGES_FOLDER = "changes"
+MANIFEST_FILE = "manifest.json"
+
+# Bump when a change to the exporter changes the derived frames, so frames cached by an older version are rebuilt
+CACHE_VERSION = 2
+
+
+def diff_rows(previous, content):
+    """
+    Finds the rows added to and removed from a CSV file, a row that appears more times than before counts as added.
+
+    Parameters:
+    previous (str): The old CSV text.
+    content (str): The new CSV text.
+
+    Returns:
+    tuple: (header of the new text, list of rows added, list of rows removed)
+    """
+    header, *new_rows = content.splitlines() or [""]
+    _, *old_rows = previous.splitlines() or [""]
+
+    remaining = Counter(old_rows)
+    added = []
+    for row in new_rows:
+        if remaining[row] > 0:
+            remaining[row] -= 1
+        else:
+            added.append(row)
+    removed = []
+    for row in old_rows:
+        if remaining[row] > 0:
+            remaining[row] -= 1
+            removed.append(row)
+
+    return header, added, removed
+
+
+class ExportCache:
+    """
+    On-disk cache of derived frames and written import files for one output folder.
+
+    Parameters:
+    output_folder (str): The output folder, the cache is kept in a .cache folder inside it.
+    enabled (bool): When False nothing is cached, every frame is built and every import file is written.
+    """
+
+    def __init__(self, output_folder, enabled=True):
+        self.enabled = enabled
+        self.folder = os.path.join(output_folder, CACHE_FOLDER)
+        self.changes_folder = os.path.join(output_folder, CHANGES_FOLDER)
+        self.used_keys = set()
+        self.outputs = {}
+        self.reused = []
+        self.rebuilt = []
+        self.manifest = {"version": CACHE_VERSION, "tfx": {}, "outputs": {}}
+
+        if not self.enabled:
+            return
+
+        os.makedirs(self.folder, exist_ok=True)
+        manifest_path = os.path.join(self.folder, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as manifest_file:
+                manifest = json.load(manifest_file)
+            if manifest.get("version") == CACHE_VERSION:
+                self.manifest = manifest
+
+    def section_hashes(self, model):
+        """
+        Returns the content hash of each section of a tfx file, without parsing it if the file has not changed.
+
+        Parameters:
+        model (TfxModel): The parsed tfx file.
+
+        Returns:
+        dict: Section name mapped to the sha256 of the section.
+        """
+        if not self.enabled:
+            return {section: None for section in model.sections}
+
+        file_hash = model.file_hash()
+        known = self.manifest["tfx"].get(str(model.source))
+        if file_hash is not None and known is not None and known["file_hash"] == file_hash:
+            return known["sections"]
+
+        hashes = model.section_hashes()
+        if file_hash is not None:
+            self.manifest["tfx"][str(model.source)] = {"file_hash": file_hash, "sections": hashes}
+        return hashes
+
+    def keep(self, name, inputs):
+        """
+        Marks a cached frame as used by this export so save() does not remove it, for a frame that was taken from
+        somewhere else such as the frame store.
+
+        Parameters:
+        name (str): Name of the derived frame.
+        inputs (list): Section hashes and settings the frame is built from.
+
+        Returns:
+        str: The cache key of the frame.
+        """
+        key = hashlib.sha256(json.dumps([CACHE_VERSION, name, inputs], default=str).encode("utf-8")).hexdigest()
+        self.used_keys.add(key)
+        return key
+
+    def frame(self, name, inputs, build):
+        """
+        Returns a derived frame from the cache, or builds and caches it if any of its inputs have changed.
+
+        Parameters:
+        name (str): Name of the derived frame, used in the summary.
+        inputs (list): Section hashes and settings the frame is built from.
+        build (callable): Builds the frame when it is not in the cache.
+
+        Returns:
+        pd.DataFrame: The derived frame.
+        """
+        if not self.enabled:
+            return build()
+
+        key = self.keep(name, inputs)
+        path = os.path.join(self.folder, f"{key}.pkl")
+
+        if os.path.exists(path):
+            with open(path, "rb") as frame_file:
+                df = pickle.load(frame_file)
+            self.reused.append(name)
+            return df
+
+        df = build()
+        with open(path, "wb") as frame_file:
+            pickle.dump(df, frame_file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.rebuilt.append(name)
+        return df
+
+    def output_changed(self, path, content):
+        """
+        Checks if an import file needs writing, writing the changed rows to the changes folder if it does.
+
+        Parameters:
+        path (str): Path of the import file.
+        content (str): The new CSV text of the import file.
+
+        Returns:
+        tuple: (changed, rows added, rows removed), rows are None when there is no previous export to compare to.
+        """
+        if not self.enabled:
+            return True, None, None
+
+        file_name = os.path.basename(path)
+        content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        self.outputs[file_name] = (path, content_hash)
+        if self._hash_on_disk(file_name, path) == content_hash:
+            return False, 0, 0
+
+        if not os.path.exists(path):
+            return True, None, None
+
+        with open(path, "r", newline="", encoding="utf-8") as previous_file:
+            previous = previous_file.read()
+        added, removed = self._write_changes(file_name, previous, content)
+        return True, added, removed
+
+    def _hash_on_disk(self, file_name, path):
+        """
+        Returns the sha256 of an import file as it is on disk, None if it does not exist. The file is only read again
+        when its size or modified time is not what was recorded, so a file edited or replaced since the last export is
+        rewritten.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        recorded = self.manifest["outputs"].get(file_name)
+        if isinstance(recorded, dict) and recorded.get("size") == stat.st_size and recorded.get("mtime_ns") == stat.st_mtime_ns:
+            return recorded["hash"]
+
+        with open(path, "rb") as output_file:
+            return hashlib.sha256(output_file.read()).hexdigest()
+
+    def _write_changes(self, file_name, previous, content):
+        """
+        Writes the rows added to and removed from an import file since the changes folder was last uploaded. Changes
+        from earlier exports that are still in the folder are added up with the new ones.
+        """
+        changes_path = os.path.join(self.changes_folder, file_name)
+        if os.path.exists(changes_path):
+            # Compare with the file as it was before the changes waiting to be uploaded
+            with open(changes_path, "r", newline="", encoding="utf-8") as changes_file:
+                _, *pending = changes_file.read().splitlines()
+            previous_header, *rows = previous.splitlines() or [""]
+            rows = Counter(rows)
+            rows.subtract(line[len("Added,"):] for line in pending if line.startswith("Added,"))
+            rows.update(line[len("Removed,"):] for line in pending if line.startswith("Removed,"))
+            previous = os.linesep.join([previous_header] + list(rows.elements()))
+
+        header, added, removed = diff_rows(previous, content)
+
+        if added or removed:
+            os.makedirs(self.changes_folder, exist_ok=True)
+            with open(changes_path, "w", newline="", encoding="utf-8") as changes_file:
+                lines = [f"Change,{header}"] + [f"Added,{row}" for row in added] + [f"Removed,{row}" for row in removed]
+                changes_file.write(os.linesep.join(lines) + os.linesep)
+        elif os.path.exists(changes_path):
+            # The file is back to what was last uploaded
+            os.remove(changes_path)
+
+        return len(added), len(removed)
+
+    def save(self):
+        """
+        Saves the manifest and removes cached frames that were not used by this export.
+
+        Returns:
+        None
+        """
+        if not self.enabled:
+            return
+
+        for file_name in os.listdir(self.folder):
+            if file_name.endswith(".pkl") and file_name[:-4] not in self.used_keys:
+                os.remove(os.path.join(self.folder, file_name))
+
+        # Recorded after writing, so the next export only reads back the files that have changed on disk since
+        for file_name, (path, content_hash) in self.outputs.items():
+            if os.path.exists(path):
+                stat = os.stat(path)
+                self.manifest["outputs"][file_name] = {"hash": content_hash, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+        with open(os.path.join(self.folder, MANIFEST_FILE), "w") as manifest_file:
+            json.dump(self.manifest, manifest_file, indent=4)
+
+        print(f"Cached frames reused: {', '.join(self.reused) or 'none'}")
+        print(f"Cached frames rebuilt: {', '.join(self.rebuilt) or 'none'}")
@@ -0,0 +1,214 @@
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from tfx_loader import hash_file
+
+### Columnar Frame Store ###
+# Saves the teachers, classes and enrolments frames the export builds as Arrow IPC files, named by a hash of the tfx
+# files they were built from. Other tools (reports, room checks) and later exports open them from here instead of
+# parsing the tfx JSON again, any tool that reads Arrow can open them.
+#
+# The files are not compressed so they can be memory-mapped: opening one reads nothing until a column is used, and
+# the text columns are read straight out of the mapped file rather than copied into Python strings.
+#
+# For another tool:
+#   frames = frame_store.open_frames("<store folder>", "<Semester 1 tfx>", "<Semester 2 tfx>", school_number, year)
+#   frames["enrolments S1"]      a DataFrame, the same as the export built
+#   frame_store.read_table(path) the Arrow table without converting it to pandas
+
+# Changing how the frames are built changes this, so files saved by an older exporter are not used
+FRAME_STORE_VERSION = 1
+
+FRAME_FILE_EXTENSION = ".arrow"
+
+# The frames kept by the export
+FRAME_NAMES = ["teachers", "enrolments S1", "enrolments S2", "classes S1", "classes S2"]
+
+# Semesters whose tfx file each frame is built from, the rest use both (the classes use the teachers of both semesters)
+FRAME_SEMESTERS = {"enrolments S1": [1], "enrolments S2": [2]}
+
+
+def write_frame(df, path):
+    """
+    Saves a frame as an uncompressed Arrow IPC file, the file is written in full before it replaces any old one.
+
+    Parameters:
+    df (pd.DataFrame): The frame to save.
+    path (str): Path of the file.
+
+    Returns:
+    None
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    temporary_path = f"{path}.tmp"
+    with pa.OSFile(temporary_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temporary_path, path)
+
+
+def read_table(path):
+    """
+    Memory-maps an Arrow IPC file, nothing is copied.
+
+    Parameters:
+    path (str): Path of the file.
+
+    Returns:
+    pyarrow.Table: The table, backed by the mapped file.
+    """
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def read_frame(path):
+    """
+    Memory-maps an Arrow IPC file saved by write_frame and converts it back to the DataFrame that was saved.
+
+    Parameters:
+    path (str): Path of the file.
+
+    Returns:
+    pd.DataFrame: The frame, text columns are pyarrow strings that still point into the mapped file.
+    """
+    table = read_table(path)
+
+    # Text columns saved from string dtypes are wrapped as they are, converting them would copy every value into a
+    # Python string. Other columns go through pyarrow, which puts back the categoricals and nullable integers.
+    numpy_types = {column["name"]: column["numpy_type"] for column in table.schema.pandas_metadata["columns"]}
+    strings = [name for name in table.column_names if numpy_types.get(name) == "string"]
+    df = table.drop_columns(strings).to_pandas()
+    for name in strings:
+        df[name] = pd.arrays.ArrowStringArray(table[name])
+    return df[table.column_names]
+
+
+class FrameStore:
+    """
+    Folder of frames saved as Arrow IPC files, keyed by the content of the tfx files they were built from.
+
+    Parameters:
+    folder (str): The store folder, None turns the store off and every frame is built.
+    semester1_tfx_path (str): Path to the Semester 1 tfx file.
+    semester2_tfx_path (str): Path to the Semester 2 tfx file.
+    school_number (int): The Schools Online school number.
+    year (int): The year being exported.
+    """
+
+    def __init__(self, folder, semester1_tfx_path, semester2_tfx_path, school_number, year):
+        self.enabled = folder is not None
+        self.folder = folder
+        self.school_number = school_number
+        self.year = year
+        self.reused = []
+        self.built = []
+
+        if not self.enabled:
+            return
+        if pa is None:
+            raise ImportError("The frame store saves Arrow files, install pyarrow (pip install pyarrow) or set frame_store_folder = None in config.py.")
+
+        os.makedirs(folder, exist_ok=True)
+        self.file_hashes = {1: hash_file(semester1_tfx_path), 2: hash_file(semester2_tfx_path)}
+
+    def key(self, name):
+        """
+        Returns the key of a frame, a hash of the tfx files it is built from, so editing one semester keeps the frames
+        that only use the other.
+
+        Parameters:
+        name (str): Name of the frame, such as "enrolments S1".
+
+        Returns:
+        str: The key, part of the file name.
+        """
+        semesters = FRAME_SEMESTERS.get(name, [1, 2])
+        sources = [FRAME_STORE_VERSION, self.school_number, self.year] + [self.file_hashes[semester] for semester in semesters]
+        return hashlib.sha256(json.dumps(sources).encode("utf-8")).hexdigest()[:16]
+
+    def _prefix(self, name):
+        return f"{self.school_number}_{self.year}_{name.replace(' ', '_')}."
+
+    def path(self, name):
+        """
+        Returns where a frame built from the current tfx files is kept.
+
+        Parameters:
+        name (str): Name of the frame, such as "enrolments S1".
+
+        Returns:
+        str: Path of the Arrow file.
+        """
+        return os.path.join(self.folder, f"{self._prefix(name)}{self.key(name)}{FRAME_FILE_EXTENSION}")
+
+    def frame(self, name, build):
+        """
+        Opens a frame from the store, or builds and saves it if the tfx files have changed since it was saved.
+
+        Parameters:
+        name (str): Name of the frame, such as "enrolments S1".
+        build (callable): Builds the frame when it is not in the store.
+
+        Returns:
+        pd.DataFrame: The frame.
+        """
+        if not self.enabled:
+            return build()
+
+        path = self.path(name)
+        if os.path.exists(path):
+            self.reused.append(name)
+            return read_frame(path)
+
+        df = build()
+        write_frame(df, path)
+        self.built.append(name)
+        self._remove_old(name, path)
+        return df
+
+    def _remove_old(self, name, path):
+        """
+        Removes the files of a frame built from earlier versions of the tfx files.
+        """
+        prefix = self._prefix(name)
+        for file_name in os.listdir(self.folder):
+            old_path = os.path.join(self.folder, file_name)
+            if file_name.startswith(prefix) and file_name.endswith(FRAME_FILE_EXTENSION) and old_path != path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    # Windows will not remove a file another tool has open, it is removed after the next export
+                    pass
+
+    def open(self):
+        """
+        Opens every frame the store has for the current tfx files.
+
+        Returns:
+        dict: Frame name mapped to the DataFrame, frames that have not been saved are left out.
+        """
+        return {name: read_frame(self.path(name)) for name in FRAME_NAMES if self.enabled and os.path.exists(self.path(name))}
+
+
+def open_frames(folder, semester1_tfx_path, semester2_tfx_path, school_number, year):
+    """
+    Opens the frames the export saved for a pair of tfx files, for tools that want them without running the export.
+
+    Parameters:
+    folder (str): The store folder.
+    semester1_tfx_path (str): Path to the Semester 1 tfx file.
+    semester2_tfx_path (str): Path to the Semester 2 tfx file.
+    school_number (int): The Schools Online school number.
+    year (int): The year exported.
+
+    Returns:
+    dict: Frame name mapped to the DataFrame, empty if the export has not been run on these files.
+    """
+    return FrameStore(folder, semester1_tfx_path, semester2_tfx_path, school_number, year).open()
@@ -0,0 +1,99 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+### Import File Writer ###
+# Splits the final classes and enrolments frames into their Schools Online import files with a single groupby and
+# writes every file in one pass, optionally on a thread pool.
+
+# Import file for each (Stage, Semester) partition, rows in any other partition are not uploaded.
+# Stage 2 classes run for the whole year so both semesters go into the one file.
+CLASS_FILES = {
+    ("1", 1): "Stage1_S1_CLASSIMP.csv",
+    ("1", 2): "Stage1_S2_CLASSIMP.csv",
+    ("2", 1): "Stage2_CLASSIMP.csv",
+    ("2", 2): "Stage2_CLASSIMP.csv",
+}
+
+ENROLMENT_FILES = {
+    (1, 1): "Stage1_S1_ENRLIMP.csv",
+    (1, 2): "Stage1_S2_ENRLIMP.csv",
+    (2, 1): "Stage2_S1_ENRLIMP.csv",
+}
+
+PARTITION_KEYS = ["Stage", "Semester"]
+
+# Prefix for the import files of the SWD classes and enrolments
+SWD_PREFIX = "SWD_"
+
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def partition(df, files, prefix=""):
+    """
+    Splits a DataFrame into its import files by grouping once on the Stage and Semester.
+
+    Parameters:
+    df (pd.DataFrame): The classes or enrolments DataFrame.
+    files (dict): (Stage, Semester) mapped to the import file name, such as CLASS_FILES or ENROLMENT_FILES.
+    prefix (str): Prefix added to each file name, SWD_PREFIX for the SWD import files.
+
+    Returns:
+    dict: File name mapped to the DataFrame of rows for that file, every file is included even when it has no rows.
+    """
+    file_positions = {file_name: [] for file_name in files.values()}
+    for key, positions in df.groupby(PARTITION_KEYS, sort=False, observed=True).indices.items():
+        if key in files:
+            file_positions[files[key]].append(positions)
+
+    # Rows keep the order they have in the DataFrame when a file takes more than one partition
+    return {
+        f"{prefix}{file_name}": df.iloc[np.sort(np.concatenate(positions)) if positions else []]
+        for file_name, positions in file_positions.items()
+    }
+
+
+def _write_file(folder, file_name, df, cache):
+    path = os.path.join(folder, file_name)
+    if cache is None or not cache.enabled:
+        with open(path, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as output_file:
+            df.to_csv(output_file, index=False)
+        return file_name, len(df), os.path.getsize(path), "written"
+
+    # Render first so an import file that has not changed since the last export is left alone
+    content = df.to_csv(index=False)
+    changed, added, removed = cache.output_changed(path, content)
+    if changed:
+        with open(path, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE) as output_file:
+            output_file.write(content)
+        status = "written" if added is None else f"written +{added} -{removed} rows"
+    else:
+        status = "unchanged"
+    return file_name, len(df), os.path.getsize(path), status
+
+
+def write_import_files(outputs, folder, workers=1, cache=None):
+    """
+    Writes each import file to the output folder and prints the rows and bytes written for each.
+
+    Parameters:
+    outputs (dict): File name mapped to the DataFrame to write.
+    folder (str): The output folder.
+    workers (int): Number of files to write at the same time, 1 writes them one after another.
+    cache (ExportCache): Optional, import files that have not changed since the last export are not rewritten.
+
+    Returns:
+    list: (file name, rows, bytes, status) for each import file.
+    """
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            summary = list(executor.map(lambda item: _write_file(folder, *item, cache), outputs.items()))
+    else:
+        summary = [_write_file(folder, file_name, df, cache) for file_name, df in outputs.items()]
+
+    print("Import files:")
+    for file_name, rows, size, status in summary:
+        print(f"    {file_name:<30} {rows:>8} rows {size:>10} bytes  {status}")
+
+    return summary
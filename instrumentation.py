@@ -0,0 +1,273 @@
+import cProfile
+import csv
+import functools
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+from tfx_model import TfxModel
+
+### Instrumentation ###
+# Opt-in timing and memory recording for the pipeline functions. Decorate a function with @instrumented and, once
+# instrumentation.enable() has been called, every call records its wall time, CPU time, rows in and out and how far
+# memory peaked above where it started. Nothing is recorded while instrumentation is disabled.
+#
+# Rows in are counted once the call has returned, a TfxModel only normalises its sections when they are first used.
+#
+# Memory is traced for the whole process, when functions run at the same time on different threads each one's peak
+# includes the memory the others used while it was running.
+#
+# From Python 3.12 cProfile profiles every thread and only one profiler can run at a time, so the whole run is
+# profiled by one profiler. Before 3.12 a profiler only sees its own thread, so each thread profiles its own calls.
+
+# A profiler that sees every thread is available
+PROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+def _count_rows(values):
+    """
+    Counts the rows of every DataFrame and TfxModel in the values, looking one level into tuples and lists.
+    """
+    rows = 0
+    for value in values:
+        items = value if isinstance(value, (tuple, list)) else [value]
+        for item in items:
+            if isinstance(item, pd.DataFrame):
+                rows += len(item)
+            elif isinstance(item, TfxModel):
+                rows += item.loaded_rows()
+    return rows
+
+
+class Instrumentation:
+    """
+    Collects a record for every call of an instrumented function while enabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self.profile = False
+        self.records = []
+        self._active = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = None
+        self._profiler = None
+        self._snapshot = None
+        self._snapshot_size = 0
+
+    def enable(self, trace_memory=True, profile=False):
+        """
+        Starts recording calls of instrumented functions.
+
+        Parameters:
+        trace_memory (bool): Record the peak memory of each call with tracemalloc, this slows the code down.
+        profile (bool): Also run cProfile over the instrumented calls for dump_profile.
+
+        Returns:
+        None
+        """
+        self.enabled = True
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.records = []
+        self._stats = None
+        self._snapshot = None
+        self._snapshot_size = 0
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile and PROFILE_ALL_THREADS:
+            self._profiler = self._start_profiler()
+
+    def disable(self):
+        """
+        Stops recording, the records collected so far are kept.
+
+        Returns:
+        None
+        """
+        self.enabled = False
+        self._stop_profiler()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def _start_profiler(self):
+        """
+        Starts a cProfile profiler, or returns None if another profiler is already running (such as python -m cProfile).
+        """
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            print("Another profiler is running, instrumented calls are not profiled.")
+            return None
+        return profiler
+
+    def _add_stats(self, profiler):
+        profiler.disable()
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profiler)
+            else:
+                self._stats.add(profiler)
+
+    def _stop_profiler(self):
+        # Stops the profiler of the whole run, its stats are kept for dump_profile
+        if self._profiler is not None:
+            self._add_stats(self._profiler)
+            self._profiler = None
+
+    def _update_peaks(self):
+        # Every call still running sees the peak reached since the last update
+        _, peak = tracemalloc.get_traced_memory()
+        for record in self._active:
+            record["peak"] = max(record["peak"], peak)
+        tracemalloc.reset_peak()
+
+    def call(self, func, args, kwargs):
+        """
+        Calls an instrumented function and records the call.
+        """
+        record = {"function": func.__name__, "thread": threading.current_thread().name}
+
+        if self.trace_memory:
+            with self._lock:
+                self._update_peaks()
+                record["start"] = tracemalloc.get_traced_memory()[0]
+                record["peak"] = record["start"]
+                self._active.append(record)
+
+        # Only the outermost instrumented call on each thread is profiled, the inner calls are part of it
+        profiler = None
+        if self.profile and not PROFILE_ALL_THREADS and not getattr(self._local, "profiling", False):
+            profiler = self._start_profiler()
+            self._local.profiling = profiler is not None
+
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = time.thread_time() - cpu_start
+
+            if profiler is not None:
+                self._add_stats(profiler)
+                self._local.profiling = False
+
+            if self.trace_memory:
+                with self._lock:
+                    self._update_peaks()
+                    self._active.remove(record)
+                record["peak_delta_mb"] = (record.pop("peak") - record.pop("start")) / 1024 / 1024
+
+        record["rows_in"] = _count_rows(list(args) + list(kwargs.values()))
+        record["rows_out"] = _count_rows([result])
+        with self._lock:
+            self.records.append(record)
+
+        # Keep a snapshot from the point the most memory was held, taken while the result is still alive
+        if self.profile and self.trace_memory:
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self._snapshot_size:
+                snapshot = tracemalloc.take_snapshot()
+                with self._lock:
+                    if current > self._snapshot_size:
+                        self._snapshot, self._snapshot_size = snapshot, current
+
+        return result
+
+    def write_report(self, path):
+        """
+        Writes the recorded calls to a JSON or CSV run report, chosen by the file extension.
+
+        Parameters:
+        path (str): Path of the report, ending in .json or .csv.
+
+        Returns:
+        None
+        """
+        columns = ["function", "thread", "wall_seconds", "cpu_seconds", "rows_in", "rows_out", "peak_delta_mb"]
+        if path.lower().endswith(".csv"):
+            with open(path, "w", newline="") as report_file:
+                writer = csv.DictWriter(report_file, fieldnames=columns, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(self.records)
+        else:
+            with open(path, "w") as report_file:
+                json.dump(self.records, report_file, indent=4)
+        print(f"Run report written to {path}")
+
+    def print_report(self):
+        """
+        Prints the total time, calls, rows and largest memory peak of each instrumented function, slowest first.
+
+        Returns:
+        None
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["function"], {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "rows_in": 0, "rows_out": 0, "peak_delta_mb": 0.0})
+            total["calls"] += 1
+            total["wall_seconds"] += record["wall_seconds"]
+            total["cpu_seconds"] += record["cpu_seconds"]
+            total["rows_in"] += record["rows_in"]
+            total["rows_out"] += record["rows_out"]
+            total["peak_delta_mb"] = max(total["peak_delta_mb"], record.get("peak_delta_mb", 0.0))
+
+        print("Instrumentation:")
+        print(f"    {'function':<28} {'calls':>5} {'wall s':>8} {'cpu s':>8} {'rows in':>9} {'rows out':>9} {'peak MB':>8}")
+        for function, total in sorted(totals.items(), key=lambda item: item[1]["wall_seconds"], reverse=True):
+            print(f"    {function:<28} {total['calls']:>5} {total['wall_seconds']:>8.3f} {total['cpu_seconds']:>8.3f} {total['rows_in']:>9} {total['rows_out']:>9} {total['peak_delta_mb']:>8.1f}")
+
+    def dump_profile(self, prefix, top=15):
+        """
+        Writes the cProfile stats and a tracemalloc snapshot for a deep dive, and prints the top entries of each.
+        The snapshot is the one taken as an instrumented call returned while the most memory was held.
+
+        Parameters:
+        prefix (str): Path prefix, <prefix>.prof and <prefix>.tracemalloc are written.
+        top (int): Number of functions and allocation sites to print.
+
+        Returns:
+        None
+        """
+        self._stop_profiler()
+        if self._stats is not None:
+            self._stats.dump_stats(f"{prefix}.prof")
+            print(f"cProfile stats written to {prefix}.prof, open with python -m pstats {prefix}.prof")
+            self._stats.sort_stats("cumulative").print_stats(top)
+
+        if self._snapshot is not None:
+            self._snapshot.dump(f"{prefix}.tracemalloc")
+            print(f"tracemalloc snapshot written to {prefix}.tracemalloc, largest allocations when {self._snapshot_size / 1024 / 1024:.1f} MB was held:")
+            for stat in self._snapshot.statistics("lineno")[:top]:
+                print(f"    {stat}")
+
+
+# The instrumentation shared by every instrumented function
+instrumentation = Instrumentation()
+
+
+def instrumented(func):
+    """
+    Decorator that records each call of the function while instrumentation is enabled.
+
+    Parameters:
+    func (callable): The function to instrument.
+
+    Returns:
+    callable: The wrapped function.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not instrumentation.enabled:
+            return func(*args, **kwargs)
+        return instrumentation.call(func, args, kwargs)
+
+    return wrapper
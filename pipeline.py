@@ -0,0 +1,123 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+### Pipeline Runner ###
+# Runs the export as a set of stages with declared dependencies, every stage whose dependencies have finished is
+# started straight away so independent branches (such as the two semesters) run at the same time.
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Parameters:
+    name (str): Name of the stage, used by other stages to depend on it.
+    func (callable): Called with the results of the dependencies in order, must be picklable to run in processes.
+    deps (list): Names of the stages that must finish first.
+    """
+
+    def __init__(self, name, func, deps=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+
+
+def _run_stage(func, args):
+    """
+    Runs one stage and times it where it runs, so the time spent waiting for a worker is not counted.
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+class Pipeline:
+    """
+    A set of stages that run as soon as their dependencies are ready.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.timings = {}
+
+    def add(self, name, func, deps=()):
+        """
+        Adds a stage to the pipeline.
+
+        Parameters:
+        name (str): Name of the stage.
+        func (callable): Called with the results of the dependencies in order.
+        deps (list): Names of the stages that must finish first, they must already have been added.
+
+        Returns:
+        None
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage {name} has already been added to the pipeline.")
+        for dep in deps:
+            if dep not in self.stages:
+                raise ValueError(f"Stage {name} depends on {dep} which has not been added to the pipeline.")
+        self.stages[name] = Stage(name, func, deps)
+
+    def run(self, executor="thread", workers=None, initializer=None):
+        """
+        Runs every stage, starting each one as soon as its dependencies have finished.
+
+        Parameters:
+        executor (str): "thread" to run stages on a thread pool or "process" to run them on a process pool.
+        workers (int): Number of stages to run at the same time, defaults to the executor's default.
+        initializer (callable): Called once in each worker process before it runs any stages.
+
+        Returns:
+        dict: Stage name mapped to its result.
+        """
+        if executor == "thread":
+            pool = ThreadPoolExecutor(max_workers=workers)
+        elif executor == "process":
+            # Workers are started fresh rather than forked, a fork copies the locks of any thread pools the parent has
+            # used (such as Polars') and the worker hangs on them
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), initializer=initializer)
+        else:
+            raise ValueError(f"Unknown executor {executor}, use thread or process.")
+
+        results = {}
+        running = {}
+        waiting = dict(self.stages)
+        pipeline_start = time.perf_counter()
+
+        with pool:
+            while waiting or running:
+                # Start every stage that has all of its dependencies
+                for name, stage in list(waiting.items()):
+                    if all(dep in results for dep in stage.deps):
+                        args = [results[dep] for dep in stage.deps]
+                        future = pool.submit(_run_stage, stage.func, args)
+                        running[future] = (name, time.perf_counter() - pipeline_start)
+                        del waiting[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, started = running.pop(future)
+                    try:
+                        results[name], seconds = future.result()
+                    except Exception:
+                        # Let the stages already running finish, but do not start any more
+                        for other in running:
+                            other.cancel()
+                        raise
+                    self.timings[name] = {"started": started, "seconds": seconds}
+
+        self.timings["total"] = {"started": 0.0, "seconds": time.perf_counter() - pipeline_start}
+        return results
+
+    def print_timings(self):
+        """
+        Prints when each stage started and how long it took, relative to the start of the pipeline.
+
+        Returns:
+        None
+        """
+        print("Stage timings:")
+        for name, timing in sorted(self.timings.items(), key=lambda item: (item[0] == "total", item[1]["started"])):
+            print(f"    {name:<16} started {timing['started']:>7.2f} s  took {timing['seconds']:>7.2f} s")
@@ -0,0 +1,105 @@
+import numpy as np
+
+### Schools Online Rules ###
+# The rules used to fill in derived columns of the import files, kept as data so a new rule is a new row in a table.
+# Each rule is a pair of (conditions, value) and the first rule whose conditions all match a row sets the value.
+# A condition key is either a column of the DataFrame or a keyword passed to apply_rules, such as swd.
+# A condition value is matched as follows:
+#   list      - the column value is one of the list
+#   Contains  - the column value contains the text
+#   otherwise - the column value equals the condition value
+
+# SACE Codes that are Stage 2 subjects but have their results due at the end of the semester they are taught in
+SPECIAL_SACE_CODES = ["RPA", "RPM", "AIF", "AIM"]
+
+# Teacher Codes are the first 7 characters of the Given Names and the first character of the Family Name
+TEACHER_GIVEN_NAME_LENGTH = 7
+
+
+class Contains:
+    """
+    Rule condition that matches when the column value contains the text.
+
+    Parameters:
+    text (str): The text to look for.
+    """
+
+    def __init__(self, text):
+        self.text = text
+
+    def __repr__(self):
+        return f"Contains({self.text!r})"
+
+
+# Results Due for the Classes Import File
+CLASS_RESULTS_DUE_RULES = [
+    ({"Credits": "20"}, "D"),
+    ({"swd": True}, "D"),
+    ({"Semester": 1, "Stage": "1"}, "J"),  # Stage 1, Semester 1
+    ({"Semester": 2, "Stage": "1"}, "D"),  # Stage 1, Semester 2
+    ({"SACE Code": SPECIAL_SACE_CODES, "Semester": 1}, "J"),  # Stage 2, Semester 1 for special codes
+    ({"SACE Code": SPECIAL_SACE_CODES, "Semester": 2}, "D"),  # Stage 2, Semester 2 for special codes
+]
+CLASS_RESULTS_DUE_DEFAULT = "D"  # All other Stage 2 subjects
+
+# Results Due for the Enrolments Import File
+ENROLMENT_RESULTS_DUE_RULES = [
+    ({"ClassCode": Contains("SWD")}, "D"),
+    ({"Semester": 1}, "J"),
+    ({"Semester": 2}, "D"),
+]
+ENROLMENT_RESULTS_DUE_DEFAULT = "CHECK!"
+
+
+def _condition_mask(df, key, value, params):
+    """
+    Evaluates one rule condition over every row of the DataFrame at once.
+    """
+    if key in df.columns:
+        column = df[key]
+        if isinstance(value, list):
+            return column.isin(value).to_numpy(dtype=bool, na_value=False)
+        if isinstance(value, Contains):
+            return column.str.contains(value.text, regex=False, na=False).to_numpy(dtype=bool)
+        return (column == value).to_numpy(dtype=bool, na_value=False)
+
+    if key not in params:
+        raise KeyError(f"Rule condition {key} is not a column or a parameter.")
+    return np.full(len(df), params[key] == value)
+
+
+def apply_rules(df, rules, default, **params):
+    """
+    Works out a value for every row of the DataFrame from a table of rules, the first matching rule wins.
+
+    Parameters:
+    df (pd.DataFrame): The DataFrame containing the columns the rules refer to.
+    rules (list): The (conditions, value) rules in order of priority.
+    default (str): The value for rows that no rule matches.
+    **params: Values for rule conditions that are not columns of the DataFrame, for example swd=True.
+
+    Returns:
+    np.ndarray: The value for each row.
+    """
+    masks = []
+    for conditions, _ in rules:
+        mask = np.ones(len(df), dtype=bool)
+        for key, value in conditions.items():
+            mask &= _condition_mask(df, key, value, params)
+        masks.append(mask)
+
+    return np.select(masks, [value for _, value in rules], default=default).astype(object)
+
+
+def teacher_codes(given_names, family_names):
+    """
+    Builds the Teacher Codes from the teachers names.
+
+    Parameters:
+    given_names (pd.Series): The teachers Given Names.
+    family_names (pd.Series): The teachers Family Names.
+
+    Returns:
+    pd.Series: The Teacher Codes.
+    """
+    return given_names.str.slice(stop=TEACHER_GIVEN_NAME_LENGTH) + family_names.str.slice(stop=1)
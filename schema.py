@@ -0,0 +1,170 @@
+import threading
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+### Frame Schemas ###
+# The dtype of every column of the frames passed between the stages of the export. Most of the text columns only
+# hold a few different values (class codes, SACE codes, stages, credits) repeated over every enrolment, stored as
+# categoricals each value is kept once and every row is a small integer. Text that is different on most rows, such as
+# student codes, is stored as pyarrow strings when pyarrow is installed, otherwise it is left as Python strings.
+# Columns a frame does not have are skipped, columns a schema does not list keep the dtype they have. A column whose
+# values do not fit its dtype, such as text IDs in a tfx file where they are usually numbers, also keeps the dtype it
+# was read with, the schemas only save memory and must not stop an export of a file that is otherwise fine.
+
+# Text that is different on most rows, pyarrow is optional
+STRING = "string[pyarrow]" if pyarrow is not None else object
+
+# A column where every row is the same text, such as the blank columns of the import files
+CONSTANT = "category"
+
+SCHEMAS = {
+    # Sections of the tfx files, as handed out by TfxModel
+    "ClassNames": {"Code": "category", "ClassNameID": "Int32", "BOSClassCode1": "category", "SubjectCode": "category"},
+    "Timetable": {"ClassNameID": "Int32", "TeacherID": "Int32"},
+    "Teachers": {"TeacherID": "Int32", "Code": STRING, "FirstName": STRING, "LastName": STRING, "Salutation": "category"},
+    "Students": {"Code": STRING, "BOSCode": STRING, "ClassCode": "category"},
+    # Frames built by create_files.py
+    "teachers": {
+        "TeacherID": "Int32",
+        "Contact School Number": "int32",
+        "Teacher Code": STRING,
+        "Family Name": STRING,
+        "Initials": "category",
+        "Title": "category",
+        "Type": CONSTANT,
+        "Teachers Registration Number": CONSTANT,
+        "Email Address": CONSTANT,
+        "Given Names": STRING,
+        "Date of Birth": CONSTANT,
+        "Gender": CONSTANT,
+    },
+    "classes": {
+        "Contact School Number": "int32",
+        "Year": "int16",
+        "Stage": "category",
+        "SACE Code": "category",
+        "Credits": "category",
+        "Class Number": "Int16",
+        "Program Variant": CONSTANT,
+        "Semester": "int8",
+        "Teacher Code": "category",
+        "School Class Code": "category",
+        "Results Due": "category",
+    },
+    "enrolments": {
+        "Contact School Number": "int32",
+        "Registration Number": STRING,
+        "Student Code": STRING,
+        "Year": "int16",
+        "Semester": "int8",
+        "Stage": "Int8",
+        "SACE Code": "category",
+        "Credits": "category",
+        "Enrolment Number": CONSTANT,
+        "Results Due": "category",
+        "Program Variant": CONSTANT,
+        "Teaching School Number": "int32",
+        "Assessment School Number": "int32",
+        "Class Number": "Int16",
+        "Enrolment Status": CONSTANT,
+        "Repeat Indicator": CONSTANT,
+        "School Class Code": "category",
+        "Stage 1 Grade": CONSTANT,
+        "Partial Credits": CONSTANT,
+        "ED ID": STRING,
+    },
+}
+
+# Python string columns longer than this are measured on this many rows, measuring every string is slow
+MEMORY_SAMPLE_ROWS = 1000
+
+# Frame name mapped to [calls, bytes before, bytes after], collected as the schemas are applied
+_savings = {}
+_savings_lock = threading.Lock()
+
+
+def frame_memory(df):
+    """
+    Works out the memory a frame uses, Python string columns are estimated from a sample of their rows.
+
+    Parameters:
+    df (pd.DataFrame): The frame to measure.
+
+    Returns:
+    float: The memory used in bytes.
+    """
+    total = df.index.memory_usage()
+    for _, column in df.items():
+        if column.dtype == object and len(column) > MEMORY_SAMPLE_ROWS:
+            total += column.iloc[:MEMORY_SAMPLE_ROWS].memory_usage(deep=True, index=False) * len(column) / MEMORY_SAMPLE_ROWS
+        else:
+            total += column.memory_usage(deep=True, index=False)
+    return total
+
+
+def apply_schema(df, name):
+    """
+    Converts the columns of a frame to the dtypes in its schema and records how much memory that saved, a column
+    that can not be converted is left as it is.
+
+    Parameters:
+    df (pd.DataFrame): The frame to convert.
+    name (str): Name of the frame's schema in SCHEMAS.
+
+    Returns:
+    pd.DataFrame: The converted frame.
+    """
+    dtypes = {col: dtype for col, dtype in SCHEMAS[name].items() if col in df.columns}
+    before = frame_memory(df)
+    try:
+        df = df.astype(dtypes)
+    except (TypeError, ValueError):
+        # Convert the columns one at a time so only the ones that do not fit are left out
+        converted = {}
+        for col, dtype in dtypes.items():
+            try:
+                converted[col] = df[col].astype(dtype)
+            except (TypeError, ValueError):
+                pass
+        df = df.assign(**converted)
+    after = frame_memory(df)
+
+    with _savings_lock:
+        totals = _savings.setdefault(name, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += before
+        totals[2] += after
+
+    return df
+
+
+def reset_memory_savings():
+    """
+    Forgets the memory savings recorded so far.
+
+    Returns:
+    None
+    """
+    with _savings_lock:
+        _savings.clear()
+
+
+def print_memory_savings():
+    """
+    Prints the memory each frame used before and after its schema was applied.
+
+    Returns:
+    None
+    """
+    with _savings_lock:
+        savings = dict(_savings)
+    if not savings:
+        return
+
+    print("Frame memory:")
+    for name, (calls, before, after) in savings.items():
+        saved = 1 - after / before if before else 0
+        print(f"    {name:<12} {calls:>3} frames {before / 1024 / 1024:>8.2f} MB -> {after / 1024 / 1024:>8.2f} MB  {saved:>4.0%} saved")
@@ -0,0 +1,304 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+### Schools Online Command Line ###
+# One entry point for everything the exporter does:
+#   python schools_online.py export     export the import files for the school in config.py
+#   python schools_online.py validate   run the checks and write Validation_Report.csv without writing import files
+#   python schools_online.py watch      keep the tfx files loaded and run the checks again each time one is saved
+#   python schools_online.py history    look back through the snapshots saved by past exports
+#   python schools_online.py check      show the settings and check the tfx files can be found
+#   python schools_online.py diff       compare the import files in two output folders
+#   python schools_online.py bench      run the benchmarks, or --startup to time how fast this script starts
+#
+# Only the modules a command needs are imported when it runs, so check, diff and --help start without loading pandas.
+
+# The quick commands (check, diff, --help) must start in less than this many seconds
+STARTUP_BUDGET_SECONDS = 0.3
+
+# Modules the quick commands must not import
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow"]
+
+# Commands timed by bench --startup
+STARTUP_COMMANDS = [["--help"], ["check"]]
+
+
+def _overrides(args):
+    """
+    The export_school arguments given on the command line, anything not given comes from config.py.
+    """
+    overrides = {
+        "school_number": args.school,
+        "year": args.year,
+        "semester1_tfx_path": args.semester1,
+        "semester2_tfx_path": args.semester2,
+        "output_folder": args.output,
+        "executor": args.executor,
+        "backend": args.backend,
+    }
+    overrides = {name: value for name, value in overrides.items() if value is not None}
+    if args.full:
+        overrides["incremental_export"] = False
+    return overrides
+
+
+def export_command(args):
+    """
+    Exports the import files.
+    """
+    import create_files
+
+    overrides = _overrides(args)
+    if args.fail_fast:
+        overrides["fail_fast"] = True
+    create_files.main(**overrides)
+    return 0
+
+
+def validate_command(args):
+    """
+    Runs the checks without writing the import files, fails if any check found an error.
+    """
+    import create_files
+
+    summary = create_files.main(validate_only=True, **_overrides(args))
+    return 1 if summary["errors"] else 0
+
+
+def watch_command(args):
+    """
+    Runs the checks again each time a tfx file is saved, until stopped with Ctrl+C.
+    """
+    import config
+    import watch
+
+    settings = config.export_settings()
+    settings.update(_overrides(args))
+    interval = args.interval if args.interval is not None else watch.POLL_SECONDS
+    watch.Watcher(settings, write=args.write).run(interval)
+    return 0
+
+
+def history_command(args):
+    """
+    Prints the snapshots saved by past exports, a student's enrolment changes or the classes that gained a team teacher.
+    """
+    import config
+    import snapshots
+
+    database = args.database or config.snapshot_database
+    if not database or not os.path.exists(database):
+        print(f"No snapshot database found at {database}, set snapshot_database in config.py and export first.")
+        return 1
+
+    if args.student:
+        result = snapshots.enrolment_changes(database, args.student)
+    elif args.team_taught_since:
+        result = snapshots.new_team_taught_classes(database, args.school or config.schoolNumber, args.team_taught_since)
+    else:
+        result = snapshots.list_snapshots(database, args.school)
+    print(result.to_string(index=False) if len(result) else "Nothing found.")
+    return 0
+
+
+def check_command(args):
+    """
+    Prints the settings the export would use and checks the tfx files exist.
+    """
+    import config
+
+    settings = config.export_settings()
+    settings.update(_overrides(args))
+    for name, value in settings.items():
+        print(f"    {name:<20} {value}")
+
+    missing = [settings[path] for path in ["semester1_tfx_path", "semester2_tfx_path"] if not os.path.exists(settings[path])]
+    for path in missing:
+        print(f"Can not find {path}")
+    if not missing:
+        print("Both tfx files found.")
+    return 1 if missing else 0
+
+
+def diff_command(args):
+    """
+    Compares the import files of two output folders, fails if any of them differ.
+    """
+    from export_cache import diff_rows
+
+    file_names = sorted({name for folder in [args.old, args.new] for name in os.listdir(folder) if name.endswith(".csv")})
+    different = 0
+    for file_name in file_names:
+        texts = []
+        for folder in [args.old, args.new]:
+            path = os.path.join(folder, file_name)
+            if os.path.exists(path):
+                with open(path, "r", newline="", encoding="utf-8") as import_file:
+                    texts.append(import_file.read())
+            else:
+                texts.append("")
+        _, added, removed = diff_rows(*texts)
+
+        if added or removed:
+            different += 1
+            print(f"    {file_name:<30} +{len(added)} -{len(removed)} rows")
+            if args.rows:
+                for row in added:
+                    print(f"        + {row}")
+                for row in removed:
+                    print(f"        - {row}")
+        else:
+            print(f"    {file_name:<30} same")
+
+    print(f"{different} of {len(file_names)} files differ.")
+    return 1 if different else 0
+
+
+def measure_startup(repeat=5):
+    """
+    Times how long the quick commands take to start, and finds any heavy modules they import.
+
+    Parameters:
+    repeat (int): Number of timed runs of each command, the best is kept.
+
+    Returns:
+    dict: Command mapped to its best time in seconds and the heavy modules it imported.
+    """
+    results = {}
+    for command in STARTUP_COMMANDS:
+        arguments = [sys.executable, os.path.abspath(__file__)] + command
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - start)
+
+        # -X importtime lists every module imported on stderr
+        imports = subprocess.run([sys.executable, "-X", "importtime"] + arguments[1:], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+        imported = {line.rsplit("|", 1)[-1].strip().split(".")[0] for line in imports.splitlines() if line.startswith("import time:")}
+        results[" ".join(command)] = {"seconds": min(times), "heavy_modules": [module for module in HEAVY_MODULES if module in imported]}
+    return results
+
+
+def bench_command(args):
+    """
+    Runs the benchmarks, or times the startup of the quick commands against the startup budget.
+    """
+    if args.startup:
+        over = 0
+        print("Startup:")
+        for command, result in measure_startup(args.repeat).items():
+            ok = result["seconds"] <= STARTUP_BUDGET_SECONDS and not result["heavy_modules"]
+            over += not ok
+            heavy = f"  imports {', '.join(result['heavy_modules'])}" if result["heavy_modules"] else ""
+            print(f"    {command:<10} {result['seconds']:>7.3f} s  {'ok' if ok else 'OVER BUDGET'}{heavy}")
+        print(f"Startup budget is {STARTUP_BUDGET_SECONDS} s without importing {', '.join(HEAVY_MODULES)}.")
+        return 1 if over else 0
+
+    import json
+
+    import benchmark
+
+    print("Benchmarks:")
+    results = benchmark.run_benchmarks(args.sizes, args.repeat)
+    if args.save:
+        with open(args.save, "w") as results_file:
+            json.dump(results, results_file, indent=4)
+    if args.compare:
+        with open(args.compare, "r") as baseline_file:
+            found = benchmark.compare(results, json.load(baseline_file), args.tolerance)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        if found:
+            return 1
+        print("No regressions.")
+    return 0
+
+
+def _add_school_arguments(parser):
+    parser.add_argument("--school", type=int, help="Schools Online school number, defaults to config.py")
+    parser.add_argument("--year", type=int, help="year being exported, defaults to config.py")
+    parser.add_argument("--semester1", help="path to the Semester 1 tfx file, defaults to config.py")
+    parser.add_argument("--semester2", help="path to the Semester 2 tfx file, defaults to config.py")
+    parser.add_argument("--output", help="output folder, defaults to config.py")
+    parser.add_argument("--executor", choices=["thread", "process"], help="what the pipeline stages run on")
+    parser.add_argument("--backend", choices=["pandas", "polars"], help="DataFrame library that builds the frames")
+    parser.add_argument("--full", action="store_true", help="rebuild and rewrite everything instead of exporting incrementally")
+
+
+def build_parser():
+    """
+    Builds the command line parser.
+
+    Returns:
+    argparse.ArgumentParser: The parser, each command sets the function that runs it.
+    """
+    parser = argparse.ArgumentParser(description="Export SACE Schools Online import files from Timetabling Solutions tfx files.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="export the import files")
+    _add_school_arguments(export_parser)
+    export_parser.add_argument("--fail-fast", action="store_true", help="stop before writing anything if validation finds an error")
+    export_parser.set_defaults(run=export_command)
+
+    validate_parser = commands.add_parser("validate", help="run the checks without writing the import files")
+    _add_school_arguments(validate_parser)
+    validate_parser.set_defaults(run=validate_command)
+
+    watch_parser = commands.add_parser("watch", help="run the checks again each time a tfx file is saved")
+    _add_school_arguments(watch_parser)
+    watch_parser.add_argument("--write", action="store_true", help="also write the import files after each save")
+    watch_parser.add_argument("--interval", type=float, help="seconds between checks of the tfx files, defaults to 0.2")
+    watch_parser.set_defaults(run=watch_command)
+
+    history_parser = commands.add_parser("history", help="look back through the snapshots saved by past exports")
+    history_parser.add_argument("--database", help="snapshot database, defaults to config.py")
+    history_parser.add_argument("--school", type=int, help="only look at this school, defaults to every school (or config.py for --team-taught-since)")
+    history_parser.add_argument("--student", help="list when this student's enrolments changed")
+    history_parser.add_argument("--team-taught-since", metavar="DATE", help="list the classes that gained a team teacher since this date, such as 2025-03-01")
+    history_parser.set_defaults(run=history_command)
+
+    check_parser = commands.add_parser("check", help="show the settings and check the tfx files can be found")
+    _add_school_arguments(check_parser)
+    check_parser.set_defaults(run=check_command)
+
+    diff_parser = commands.add_parser("diff", help="compare the import files in two output folders")
+    diff_parser.add_argument("old", help="folder of the earlier export")
+    diff_parser.add_argument("new", help="folder of the later export")
+    diff_parser.add_argument("--rows", action="store_true", help="print the rows added and removed")
+    diff_parser.set_defaults(run=diff_command)
+
+    # benchmark only imports the exporter when it runs, it is quick to import for its settings
+    import benchmark
+
+    bench_parser = commands.add_parser("bench", help="run the benchmarks")
+    bench_parser.add_argument("--sizes", nargs="+", choices=list(benchmark.SIZES), default=None, help="sizes to run, defaults to all")
+    bench_parser.add_argument("--repeat", type=int, default=benchmark.REPEAT, help="number of timed runs")
+    bench_parser.add_argument("--save", help="save the results to this JSON file")
+    bench_parser.add_argument("--compare", help="compare the results against a JSON file saved with --save")
+    bench_parser.add_argument("--tolerance", type=float, default=benchmark.TOLERANCE)
+    bench_parser.add_argument("--startup", action="store_true", help="time how fast the quick commands start instead")
+    bench_parser.set_defaults(run=bench_command)
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs the command given on the command line.
+
+    Parameters:
+    argv (list): The arguments, defaults to sys.argv.
+
+    Returns:
+    int: The exit code.
+    """
+    args = build_parser().parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import datetime
+import sqlite3
+
+import pandas as pd
+
+### Export Snapshots ###
+# Every export saves a snapshot of what it read and wrote to a SQLite database, so questions about the past, such as
+# when a student's enrolments changed or which classes gained a team teacher this week, can be answered without
+# finding old copies of the tfx files and running the export again.
+#
+# Tables:
+#   snapshots                   one row per export, with when it ran and the school, year and tfx files
+#   snapshot_sections           the content hash of each tfx section each snapshot was made from
+#   tfx_ClassNames, tfx_Timetable, tfx_Teachers, tfx_Students
+#                               the normalised tfx sections, stored once per content hash. A section that has not
+#                               changed since an earlier snapshot is not stored again (or parsed)
+#   teachers, classes, enrolments
+#                               the rows of the import files, one set per snapshot
+# The student, class, teacher and SACE code columns are indexed so lookups across every snapshot and year are quick.
+
+# Table the rows of each tfx section are kept in
+SECTION_TABLES = {
+    "ClassNames": "tfx_ClassNames",
+    "Timetable": "tfx_Timetable",
+    "Teachers": "tfx_Teachers",
+    "Students": "tfx_Students",
+}
+
+# (table, column) pairs that are indexed
+INDEXES = [
+    ("snapshot_sections", "snapshot_id"),
+    ("tfx_ClassNames", "section_hash"),
+    ("tfx_ClassNames", "Code"),
+    ("tfx_ClassNames", "BOSClassCode1"),
+    ("tfx_Timetable", "section_hash"),
+    ("tfx_Teachers", "section_hash"),
+    ("tfx_Teachers", "Code"),
+    ("tfx_Students", "section_hash"),
+    ("tfx_Students", "Code"),
+    ("tfx_Students", "ClassCode"),
+    ("teachers", "snapshot_id"),
+    ("teachers", "Teacher Code"),
+    ("classes", "snapshot_id"),
+    ("classes", "School Class Code"),
+    ("classes", "Teacher Code"),
+    ("classes", "SACE Code"),
+    ("enrolments", "snapshot_id"),
+    ("enrolments", "Student Code"),
+    ("enrolments", "School Class Code"),
+    ("enrolments", "SACE Code"),
+]
+
+# Columns that identify an enrolment when comparing snapshots
+ENROLMENT_COLUMNS = ["Semester", "SACE Code", "School Class Code"]
+
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    taken_at TEXT NOT NULL,
+    school_number INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    semester1_tfx TEXT,
+    semester2_tfx TEXT
+);
+CREATE TABLE IF NOT EXISTS snapshot_sections (
+    snapshot_id INTEGER NOT NULL REFERENCES snapshots (snapshot_id),
+    semester INTEGER NOT NULL,
+    section TEXT NOT NULL,
+    section_hash TEXT NOT NULL
+);
+"""
+
+
+def connect(path):
+    """
+    Opens the snapshot database, creating it if it does not exist yet.
+
+    Parameters:
+    path (str): Path to the SQLite file.
+
+    Returns:
+    sqlite3.Connection: The open database.
+    """
+    connection = sqlite3.connect(path, timeout=30)
+    connection.executescript(CREATE_TABLES)
+    return connection
+
+
+def _create_indexes(connection):
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    for table, column in INDEXES:
+        if table in tables:
+            name = f"ix_{table}_{column}".replace(" ", "_")
+            connection.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ("{column}")')
+
+
+def _append(connection, table, df):
+    """
+    Appends rows to a table, adding any columns the table does not have yet, such as a tfx section that has gained a
+    field since the table was created by an earlier snapshot.
+    """
+    # SQLite column names are not case sensitive
+    existing = {row[1].lower() for row in connection.execute(f'PRAGMA table_info("{table}")')}
+    if existing:
+        for column in df.columns:
+            if column.lower() not in existing:
+                connection.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}"')
+    df.to_sql(table, connection, if_exists="append", index=False)
+
+
+def _section_stored(connection, table, section_hash):
+    """
+    Checks if the rows of a tfx section with this content hash have already been stored.
+    """
+    exists = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if not exists:
+        return False
+    return connection.execute(f'SELECT 1 FROM "{table}" WHERE section_hash = ? LIMIT 1', (section_hash,)).fetchone() is not None
+
+
+def save_snapshot(path, school_number, year, semesters, frames, taken_at=None):
+    """
+    Saves a snapshot of one export.
+
+    Parameters:
+    path (str): Path to the SQLite file.
+    school_number (int): The Schools Online school number.
+    year (int): The year exported.
+    semesters (dict): Semester number mapped to the load_semester result (TfxModel, section hashes).
+    frames (dict): Frame name (teachers, classes or enrolments) mapped to the rows written to its import files.
+    taken_at (datetime.datetime): When the export ran, defaults to now.
+
+    Returns:
+    int: The id of the new snapshot.
+    """
+    taken_at = taken_at or datetime.datetime.now()
+    connection = connect(path)
+    try:
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO snapshots (taken_at, school_number, year, semester1_tfx, semester2_tfx) VALUES (?, ?, ?, ?, ?)",
+                (taken_at.isoformat(timespec="seconds"), school_number, year, str(semesters[1][0].source), str(semesters[2][0].source)),
+            )
+            snapshot_id = cursor.lastrowid
+
+            for semester, (tfx_model, hashes) in semesters.items():
+                # Without the incremental cache the hashes are not known yet
+                if any(value is None for value in hashes.values()):
+                    hashes = tfx_model.section_hashes()
+                for section, table in SECTION_TABLES.items():
+                    if section not in hashes:
+                        continue
+                    section_hash = hashes[section]
+                    connection.execute(
+                        "INSERT INTO snapshot_sections (snapshot_id, semester, section, section_hash) VALUES (?, ?, ?, ?)",
+                        (snapshot_id, semester, section, section_hash),
+                    )
+                    if _section_stored(connection, table, section_hash):
+                        continue
+                    section_df = tfx_model[section]
+                    if not section_df.empty:
+                        _append(connection, table, section_df.assign(section_hash=section_hash))
+
+            for name, df in frames.items():
+                _append(connection, name, df.assign(snapshot_id=snapshot_id))
+
+            _create_indexes(connection)
+    finally:
+        connection.close()
+
+    return snapshot_id
+
+
+### Queries ###
+
+
+def query(path, sql, params=()):
+    """
+    Runs any SQL query against the snapshot database.
+
+    Parameters:
+    path (str): Path to the SQLite file.
+    sql (str): The query, column names with spaces need double quotes such as "Student Code".
+    params (tuple): Values for the ? placeholders in the query.
+
+    Returns:
+    pd.DataFrame: The rows found.
+    """
+    connection = connect(path)
+    try:
+        return pd.read_sql_query(sql, connection, params=params)
+    finally:
+        connection.close()
+
+
+def list_snapshots(path, school_number=None):
+    """
+    Lists the snapshots saved, oldest first.
+
+    Parameters:
+    path (str): Path to the SQLite file.
+    school_number (int): Only list the snapshots of this school, defaults to every school.
+
+    Returns:
+    pd.DataFrame: One row for each snapshot.
+    """
+    if school_number is None:
+        return query(path, "SELECT * FROM snapshots ORDER BY snapshot_id")
+    return query(path, "SELECT * FROM snapshots WHERE school_number = ? ORDER BY snapshot_id", (school_number,))
+
+
+def student_history(path, student_code):
+    """
+    Finds every enrolment of a student in every snapshot.
+
+    Parameters:
+    path (str): Path to the SQLite file.
+    student_code (str): The school's code for the student.
+
+    Returns:
+    pd.DataFrame: The enrolment rows with when their snapshot was taken, oldest first.
+    """
+    return query(
+        path,
+        'SELECT s.taken_at, s.school_number, e.* FROM enrolments e JOIN snapshots s USING (snapshot_id) '
+        'WHERE e."Student Code" = ? ORDER BY s.snapshot_id',
+        (student_code,),
+    )
+
+
+def enrolment_changes(path, student_code):
+    """
+    Works out when a student's enrolments changed, comparing each snapshot with the one before it for the same
+    school and year.
+
+    Parameters:
+    path (str): Path to the SQLite file.
+    student_code (str): The school's code for the student.
+
+    Returns:
+    pd.DataFrame: One row for each enrolment added or removed, with the snapshot it changed in.
+    """
+    snapshots = list_snapshots(path)
+    history = student_history(path, student_code)
+    by_snapshot = {}
+    for snapshot_id, *enrolment in zip(history["snapshot_id"], *(history[column] for column in ENROLMENT_COLUMNS)):
+        by_snapshot.setdefault(snapshot_id, set()).add(tuple(enrolment))
+    changes = []
+    for _, group in snapshots.groupby(["school_number", "year"], sort=False):
+        previous = set()
+        for snapshot in group.itertuples():
+            current = by_snapshot.get(snapshot.snapshot_id, set())
+            for change, changed in [("Added", current - previous), ("Removed", previous - current)]:
+                changes += [(snapshot.snapshot_id, snapshot.taken_at, change) + enrolment for enrolment in sorted(changed, key=str)]
+            previous = current
+    return pd.DataFrame(changes, columns=["snapshot_id", "taken_at", "Change"] + ENROLMENT_COLUMNS)
+
+
+def team_taught_classes(path, snapshot_id):
+    """
+    Finds the classes with more than one teacher in a snapshot.
+
+    Parameters:
+    path (str): Path to the SQLite file.
+    snapshot_id (int): The snapshot to look in.
+
+    Returns:
+    pd.DataFrame: One row for each class with its number of teachers and the teacher codes.
+    """
+    return query(
+        path,
+        'SELECT "School Class Code", "Semester", COUNT(*) AS teachers, GROUP_CONCAT("Teacher Code", \', \') AS teacher_codes '
+        'FROM classes WHERE snapshot_id = ? GROUP BY "School Class Code", "Semester" HAVING COUNT(*) > 1 '
+        'ORDER BY "School Class Code", "Semester"',
+        (snapshot_id,),
+    )
+
+
+def new_team_taught_classes(path, school_number, since):
+    """
+    Finds the classes that have gained a team teacher since a date, comparing the latest snapshot of the school with
+    the last snapshot taken before the date.
+
+    Parameters:
+    path (str): Path to the SQLite file.
+    school_number (int): The Schools Online school number.
+    since (str): ISO date such as "2025-03-01".
+
+    Returns:
+    pd.DataFrame: The team_taught_classes rows of the latest snapshot that were not team taught before the date.
+    """
+    snapshots = list_snapshots(path, school_number)
+    if snapshots.empty:
+        return team_taught_classes(path, -1)
+    latest = team_taught_classes(path, int(snapshots["snapshot_id"].iloc[-1]))
+
+    before = snapshots.loc[snapshots["taken_at"] < since, "snapshot_id"]
+    if before.empty:
+        return latest
+    earlier = team_taught_classes(path, int(before.iloc[-1]))
+    known = set(zip(earlier["School Class Code"], earlier["Semester"]))
+    return latest[[key not in known for key in zip(latest["School Class Code"], latest["Semester"])]].reset_index(drop=True)
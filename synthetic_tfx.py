@@ -0,0 +1,143 @@
+import argparse
+import datetime
+import json
+import os
+import random
+
+### Synthetic tfx Generator ###
+# Builds made up Timetable Development (tfx) files with the sections and fields the exporter reads, so the exporter
+# can be run and measured without a real timetable. The size of the school is set by the number of students,
+# classes and teachers, and a share of the SACE classes can be made SWD classes.
+
+SACE_SUBJECTS = ["ENG", "MAT", "MAM", "PHY", "CHE", "BIO", "HIS", "ART", "MUS", "PSY", "BUS", "DIG", "RPA", "RPM", "AIF", "AIM"]
+NON_SACE_SUBJECTS = ["PE", "HOME", "ASSY", "STDY"]
+GIVEN_NAMES = ["Joe", "Jonathan", "Anne", "Mei", "Oliver", "Charlotte", "Ahmed", "Priya", "Liam", "Sophie", "Nguyen", "Isabella"]
+FAMILY_NAMES = ["Blogs", "Foobar", "Smith", "Nguyen", "Brown", "Wilson", "Taylor", "Patel", "Martin", "Walker", "Young", "King"]
+SALUTATIONS = ["Mr", "Mrs", "Ms", "Dr"]
+
+
+def generate_tfx(students=1000, classes=None, teachers=None, swd_ratio=0.05, semester=1, seed=0):
+    """
+    Generates a synthetic tfx document.
+
+    Parameters:
+    students (int): Number of students.
+    classes (int): Number of classes, defaults to one for every 8 students.
+    teachers (int): Number of teachers, defaults to one for every 25 students.
+    swd_ratio (float): Share of the SACE classes that are SWD classes.
+    semester (int): The semester, used to vary the classes between the two files of a year.
+    seed (int): Random seed, the same arguments and seed always give the same document.
+
+    Returns:
+    dict: The tfx document.
+    """
+    rng = random.Random(f"{seed}-{semester}")
+    classes = classes or max(students // 8, 10)
+    teachers = teachers or max(students // 25, 5)
+
+    teacher_records = []
+    for teacher_id in range(1, teachers + 1):
+        teacher_records.append({
+            "TeacherID": teacher_id,
+            "Code": f"T{teacher_id:03d}",
+            "FirstName": rng.choice(GIVEN_NAMES),
+            "LastName": rng.choice(FAMILY_NAMES),
+            "Salutation": rng.choice(SALUTATIONS),
+            "MaxLoad": rng.randint(20, 40),
+            "Faculty": rng.choice(["English", "Maths", "Science", "Arts", "HASS"]),
+        })
+
+    class_records = []
+    for class_name_id in range(1, classes + 1):
+        record = {"ClassNameID": class_name_id, "Colour": rng.randint(0, 0xFFFFFF), "RoomID": rng.randint(1, 60)}
+        if rng.random() < 0.85:
+            stage = rng.choice(["1", "2"])
+            subject = rng.choice(SACE_SUBJECTS)
+            credits = "20" if stage == "2" or rng.random() < 0.3 else "10"
+            swd = "SWD" if rng.random() < swd_ratio else ""
+            record["Code"] = f"{stage}{subject}{class_name_id:04d}{'S' if swd else ''}"
+            record["SubjectCode"] = f"{stage}{subject}"
+            record["BOSClassCode1"] = f"{stage}{subject}{credits}{swd}"
+        else:
+            subject = rng.choice(NON_SACE_SUBJECTS)
+            record["Code"] = f"{subject}{class_name_id:04d}"
+            record["SubjectCode"] = subject
+        class_records.append(record)
+
+    timetable_records = []
+    for record in class_records:
+        # Most classes have one teacher, some are team taught
+        class_teachers = rng.sample(range(1, teachers + 1), 2 if rng.random() < 0.1 else 1)
+        for teacher_id in class_teachers:
+            for period in rng.sample(range(1, 51), rng.randint(2, 6)):
+                timetable_records.append({"ClassNameID": record["ClassNameID"], "TeacherID": teacher_id, "PeriodID": period, "RoomID": record["RoomID"]})
+
+    student_records = []
+    for student_id in range(1, students + 1):
+        lessons = [{"ClassCode": record["Code"], "Locked": False} for record in rng.sample(class_records, min(rng.randint(4, 7), len(class_records)))]
+        student_records.append({
+            "StudentID": student_id,
+            "Code": f"{100000 + student_id}",
+            "BOSCode": f"{rng.randint(100000, 999999)}{rng.choice('ABCDEFGHJK')}",
+            "FirstName": rng.choice(GIVEN_NAMES),
+            "LastName": rng.choice(FAMILY_NAMES),
+            "RollClass": f"{rng.randint(10, 12)}{rng.choice('ABCD')}",
+            "StudentLessons": lessons,
+        })
+
+    return {
+        "FileVersion": 12,
+        "Settings": {"Semester": semester, "Days": 10, "PeriodsPerDay": 5},
+        "Teachers": teacher_records,
+        "ClassNames": class_records,
+        "Timetable": timetable_records,
+        "Students": student_records,
+    }
+
+
+def write_tfx(path, **kwargs):
+    """
+    Generates a synthetic tfx document and writes it to a file.
+
+    Parameters:
+    path (str): Path of the tfx file to write.
+    **kwargs: Arguments for generate_tfx.
+
+    Returns:
+    str: The path written.
+    """
+    with open(path, "w") as tfx_file:
+        json.dump(generate_tfx(**kwargs), tfx_file)
+    return path
+
+
+def write_year(folder, year=None, **kwargs):
+    """
+    Writes a Semester 1 and a Semester 2 synthetic tfx file named the same way as config.py expects.
+
+    Parameters:
+    folder (str): Folder to write the files to.
+    year (int): Year used in the file names, defaults to this year.
+    **kwargs: Arguments for generate_tfx.
+
+    Returns:
+    tuple: Paths of the Semester 1 and Semester 2 files.
+    """
+    year = year or datetime.date.today().year
+    os.makedirs(folder, exist_ok=True)
+    return tuple(write_tfx(os.path.join(folder, f"TTD_{year}_S{semester}.tfx"), semester=semester, **kwargs) for semester in (1, 2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic Semester 1 and Semester 2 tfx file.")
+    parser.add_argument("folder", help="folder to write TTD_<year>_S1.tfx and TTD_<year>_S2.tfx to")
+    parser.add_argument("--year", type=int, default=None)
+    parser.add_argument("--students", type=int, default=1000)
+    parser.add_argument("--classes", type=int, default=None)
+    parser.add_argument("--teachers", type=int, default=None)
+    parser.add_argument("--swd-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for written in write_year(args.folder, args.year, students=args.students, classes=args.classes, teachers=args.teachers, swd_ratio=args.swd_ratio, seed=args.seed):
+        print(f"Written {written} ({os.path.getsize(written) / 1024 / 1024:.1f} MB)")
@@ -0,0 +1,15 @@
+import pytest
+
+from backends import check_parity
+from synthetic_tfx import write_year
+
+### Backend Parity Tests ###
+# Every backend must write the same import files and SWD frames as the pandas backend, byte for byte.
+
+pytest.importorskip("polars")
+
+
+@pytest.mark.parametrize("students, seed", [(200, 0), (2000, 1)])
+def test_backends_match_pandas(tmp_path, students, seed):
+    semester1, semester2 = write_year(str(tmp_path), 2000, students=students, swd_ratio=0.2, seed=seed)
+    assert check_parity(semester1, semester2) == []
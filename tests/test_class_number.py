@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import create_files
+from synthetic_tfx import generate_tfx
+from tfx_model import TfxModel, copy_on_write
+
+### generate_class_number Parity ###
+# generate_class_number used to number the classes with a loop over every row. The loop is kept here as the reference
+# and the vectorised version must give exactly the same Sequence on a synthetic timetable of over 100,000 enrolments.
+
+# Enough students for the Semester 1 enrolments to pass 100,000 rows
+STUDENTS = 25000
+
+MINIMUM_ENROLMENTS = 100000
+
+
+def reference_class_number(df):
+    """
+    The original row by row generate_class_number.
+    """
+    df['Sequence'] = 0
+    # observed=True only skips the empty groups of the categorical columns, which the loop never numbered anything in
+    grouped = df.groupby(["Stage", "SACE Code", "Credits"], observed=True)
+    for name, group in grouped:
+        class_code_dict = {}
+        sequence = 1
+        for index, row in group.iterrows():
+            class_code = row['ClassCode']
+            if class_code not in class_code_dict:
+                class_code_dict[class_code] = sequence
+                sequence += 1
+            df.at[index, 'Sequence'] = class_code_dict[class_code]
+    return df
+
+
+@pytest.fixture(scope="module")
+def enrolments():
+    """
+    The Semester 1 enrolments of a large synthetic timetable, in the shape get_enrollments numbers them in.
+    """
+    with copy_on_write():
+        df = create_files.get_enrollments(TfxModel(generate_tfx(students=STUDENTS, seed=3)), 1, 999, 2000)
+    return df.drop(columns=["Class Number"]).rename(columns={"School Class Code": "ClassCode"})
+
+
+def check_parity(df):
+    expected = reference_class_number(df.copy())["Sequence"].to_numpy()
+    actual = create_files.generate_class_number(df.copy())["Sequence"].to_numpy()
+    np.testing.assert_array_equal(actual, expected)
+
+
+def test_matches_reference(enrolments):
+    assert len(enrolments) >= MINIMUM_ENROLMENTS
+    check_parity(enrolments)
+
+
+def test_matches_reference_shuffled(enrolments):
+    # The numbers follow the order the classes are first seen, so a different row order must still match
+    check_parity(enrolments.sample(frac=1, random_state=1).reset_index(drop=True))
+
+
+def test_matches_reference_with_missing_group_keys(enrolments):
+    # Rows with a missing Stage, SACE Code or Credits are in no group and keep a Sequence of 0
+    df = enrolments.copy()
+    df.loc[df.index[::97], "Stage"] = pd.NA
+    df.loc[df.index[5::89], "SACE Code"] = np.nan
+    df.loc[df.index[7::83], "Credits"] = np.nan
+    check_parity(df)
@@ -0,0 +1,105 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from rules import (CLASS_RESULTS_DUE_DEFAULT, CLASS_RESULTS_DUE_RULES, ENROLMENT_RESULTS_DUE_DEFAULT,
+                   ENROLMENT_RESULTS_DUE_RULES, apply_rules, teacher_codes)
+
+### Rule Table Golden Tests ###
+# The rule tables replaced lambdas run on every row with DataFrame.apply. The lambdas are kept here as the reference
+# and the tables must give the same value for every combination of the columns they look at.
+
+STAGES = ["1", "2"]
+SEMESTERS = [1, 2, 3]
+CREDITS = ["10", "20"]
+SACE_CODES = ["RPA", "RPM", "AIF", "AIM", "ENG", "MAT"]
+SWD = [False, True]
+
+
+def reference_class_results_due(row, msswd):
+    """
+    The original classes Results Due lambda.
+    """
+    return (
+        'D' if row['Credits'] == "20" else
+        'D' if msswd == "swd" else
+        'J' if row['Semester'] == 1 and row['Stage'] == "1" else  # Stage 1, Semester 1
+        'D' if row['Semester'] == 2 and row['Stage'] == "1" else  # Stage 1, Semester 2
+        'J' if row['SACE Code'] in ['RPA', 'RPM', 'AIF', 'AIM'] and row['Semester'] == 1 else  # Stage 2, Semester 1 for special codes
+        'D' if row['SACE Code'] in ['RPA', 'RPM', 'AIF', 'AIM'] and row['Semester'] == 2 else  # Stage 2, Semester 2 for special codes
+        'D'  # Default return for all other Stage 2 subjects
+    )
+
+
+def reference_enrolment_results_due(row):
+    """
+    The original enrolments Results Due lambda.
+    """
+    return (
+        'D' if "SWD" in row["ClassCode"] else
+        'J' if row['Semester'] == 1 else  # Stage 1, Semester 1
+        'D' if row['Semester'] == 2 else  # Stage 1, Semester 2
+        'CHECK!'
+    )
+
+
+def reference_teacher_code(row):
+    """
+    The original update_teacher_code lambda.
+    """
+    return row["Given Names"][:min(7, len(row["Given Names"]))] + row["Family Name"][0]
+
+
+def _categorical(df, columns):
+    # The export hands the rules categorical columns, the plain columns are checked as well
+    return df.astype({column: "category" for column in columns})
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+@pytest.mark.parametrize("swd", SWD)
+def test_class_results_due(swd, categorical):
+    df = pd.DataFrame(list(itertools.product(STAGES, SEMESTERS, CREDITS, SACE_CODES)), columns=["Stage", "Semester", "Credits", "SACE Code"])
+    msswd = "swd" if swd else "ms"
+    expected = df.apply(reference_class_results_due, axis=1, msswd=msswd).tolist()
+    if categorical:
+        df = _categorical(df, ["Stage", "Credits", "SACE Code"])
+
+    actual = apply_rules(df, CLASS_RESULTS_DUE_RULES, CLASS_RESULTS_DUE_DEFAULT, swd=msswd == "swd").tolist()
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_enrolment_results_due(categorical):
+    class_codes = [f"{stage}{code}{number}{suffix}" for stage, code, number, suffix in itertools.product(STAGES, SACE_CODES, ["001", "219"], ["", "SWD", "SWDLONG"])]
+    df = pd.DataFrame(list(itertools.product(SEMESTERS, class_codes)), columns=["Semester", "ClassCode"])
+    expected = df.apply(reference_enrolment_results_due, axis=1).tolist()
+    if categorical:
+        df = _categorical(df, ["ClassCode"])
+
+    actual = apply_rules(df, ENROLMENT_RESULTS_DUE_RULES, ENROLMENT_RESULTS_DUE_DEFAULT).tolist()
+
+    assert actual == expected
+
+
+GIVEN_NAMES = ["", "A", "Ann", "Jonatha", "Jonathan", "Christopher", "Mary-Jane", "Zoë"]
+FAMILY_NAMES = ["B", "Smith", "O'Neil", "Érdi"]
+
+
+def test_teacher_codes():
+    df = pd.DataFrame(list(itertools.product(GIVEN_NAMES, FAMILY_NAMES)), columns=["Given Names", "Family Name"])
+    expected = df.apply(reference_teacher_code, axis=1).tolist()
+
+    actual = teacher_codes(df["Given Names"], df["Family Name"]).tolist()
+
+    assert actual == expected
+
+
+def test_teacher_codes_empty_family_name():
+    # The old lambda failed the whole export on a teacher with no Family Name, the code is now just the Given Names
+    df = pd.DataFrame({"Given Names": ["Christopher", "Ann"], "Family Name": ["", ""]})
+    with pytest.raises(IndexError):
+        df.apply(reference_teacher_code, axis=1)
+
+    assert teacher_codes(df["Given Names"], df["Family Name"]).tolist() == ["Christo", "Ann"]
@@ -0,0 +1,35 @@
+import pandas as pd
+
+import create_files
+from schema import apply_schema
+from synthetic_tfx import generate_tfx
+from tfx_model import TfxModel, copy_on_write
+
+### Frame Schema Tests ###
+# The schemas only save memory, a tfx file whose values do not fit them must export the same as one whose values do.
+
+
+def text_ids(doc):
+    """
+    Changes the numeric ClassNameID and TeacherID of a tfx document to text.
+    """
+    for section in ("ClassNames", "Timetable", "Teachers"):
+        for record in doc[section]:
+            if "ClassNameID" in record:
+                record["ClassNameID"] = f"C{record['ClassNameID']}"
+            if "TeacherID" in record:
+                record["TeacherID"] = f"T{record['TeacherID']}"
+    return doc
+
+
+def test_column_that_does_not_fit_keeps_its_dtype():
+    df = apply_schema(pd.DataFrame({"ClassNameID": ["C1", "C2"], "TeacherID": [1, 2]}), "Timetable")
+    assert df["ClassNameID"].tolist() == ["C1", "C2"]
+    assert df["TeacherID"].dtype == "Int32"
+
+
+def test_text_ids_export_the_same():
+    with copy_on_write():
+        expected = create_files.get_enrollments(TfxModel(generate_tfx(students=300, seed=1)), 1, 999, 2000)
+        actual = create_files.get_enrollments(TfxModel(text_ids(generate_tfx(students=300, seed=1))), 1, 999, 2000)
+    pd.testing.assert_frame_equal(actual, expected)
@@ -0,0 +1,41 @@
+import json
+
+import pandas as pd
+import pytest
+
+from tfx_loader import load_tfx
+
+### Streaming Loader Chunk Tests ###
+# The loader reads the file a chunk at a time, a value cut in two by the end of a chunk must decode the same as when
+# the whole file is read at once. Every chunk size up to the length of the document is tried so every value is cut
+# at every point.
+
+DOCUMENT = {
+    "Version": 12.5,
+    "Settings": {"Scale": 21.75, "Limit": 1e5, "Offset": -3.25, "Flag": True, "Empty": None},
+    "ClassNames": [{"Code": "10ENG1", "ClassNameID": 1, "BOSClassCode1": "1ENG10", "SubjectCode": "ENG"}],
+    "Timetable": [{"ClassNameID": 1, "TeacherID": 7}],
+    "Extra": [0.5, 12.125, 2e-3, 45],
+    "Teachers": [{"TeacherID": 7, "Code": "ABC", "FirstName": "Ann", "LastName": "Brown", "Salutation": "Ms"}],
+    "Students": [{"Code": "S1", "BOSCode": "123", "StudentLessons": [{"ClassCode": "10ENG1"}]}],
+    "Weight": 99.875,
+}
+
+
+@pytest.fixture(scope="module")
+def tfx_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tfx") / "chunks.tfx"
+    path.write_text(json.dumps(DOCUMENT))
+    return str(path)
+
+
+def test_every_chunk_size_matches_reading_at_once(tfx_path):
+    expected_hashes = {}
+    expected = load_tfx(tfx_path, hashes=expected_hashes)
+
+    for chunk_size in range(1, len(json.dumps(DOCUMENT)) + 1):
+        hashes = {}
+        frames = load_tfx(tfx_path, chunk_size=chunk_size, hashes=hashes)
+        assert hashes == expected_hashes, f"chunk size {chunk_size}"
+        for section, frame in expected.items():
+            pd.testing.assert_frame_equal(frames[section], frame, obj=f"{section} with chunk size {chunk_size}")
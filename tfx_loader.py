@@ -0,0 +1,333 @@
+import hashlib
+import json
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+### Streaming tfx Loader ###
+# The tfx files are a single large JSON document. json.load builds the whole document as Python objects before
+# anything can be pulled out of it, on a large timetable that is several times the size of the file itself.
+# This module walks the document in chunks and only keeps the fields the exporters read from each section.
+
+# Fields kept from each record of the sections the exporters use, anything else in the file is skipped.
+TFX_FIELDS = {
+    "ClassNames": ["Code", "ClassNameID", "BOSClassCode1", "SubjectCode"],
+    "Timetable": ["ClassNameID", "TeacherID"],
+    "Teachers": ["TeacherID", "Code", "FirstName", "LastName", "Salutation"],
+    "Students": ["Code", "BOSCode"],
+}
+
+# Fields kept from each of the StudentLessons within a student record.
+STUDENT_LESSON_FIELDS = ["ClassCode"]
+
+CHUNK_SIZE = 1024 * 1024
+
+# Characters that can follow the part of a JSON number already read
+NUMBER_CHARACTERS = ".eE+-0123456789"
+
+
+class _JsonStream:
+    """
+    Minimal pull parser over a JSON text file, reads the file a chunk at a time and decodes one value at a time.
+    """
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.capture = None
+        self.capture_from = 0
+
+    def _read_more(self):
+        chunk = self.file.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop everything that has already been consumed before growing the buffer
+        if self.capture is not None:
+            self.capture.update(self.buffer[self.capture_from:self.pos].encode("utf-8"))
+            self.capture_from = 0
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def start_capture(self):
+        """
+        Starts hashing the raw text of the file from the start of the next value.
+        """
+        self._skip_whitespace()
+        self.capture = hashlib.sha256()
+        self.capture_from = self.pos
+
+    def stop_capture(self):
+        """
+        Stops hashing and returns the hash of the raw text read since start_capture.
+        """
+        self.capture.update(self.buffer[self.capture_from:self.pos].encode("utf-8"))
+        digest = self.capture.hexdigest()
+        self.capture = None
+        return digest
+
+    def _skip_whitespace(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._read_more():
+                return
+
+    def peek(self):
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise ValueError("Unexpected end of tfx file.")
+        return self.buffer[self.pos]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in tfx file but found '{self.buffer[self.pos]}'.")
+        self.pos += 1
+
+    def _number_cut(self, value, end):
+        """
+        Checks if a decoded number may be the start of a longer number, it either reaches the end of the buffer or
+        stops at a character that can only carry the number on.
+        """
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return False
+        return end == len(self.buffer) or self.buffer[end] in NUMBER_CHARACTERS
+
+    def decode_value(self):
+        """
+        Decodes the next complete JSON value, reading more of the file until the value is complete.
+        """
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._read_more():
+                    continue
+                raise
+            # A number cut off by the end of the buffer may carry on in the next chunk, such as 12. and 5 decoding as 12
+            if self._number_cut(value, end) and not self.eof and self._read_more():
+                continue
+            self.pos = end
+            return value
+
+    def iter_object(self):
+        """
+        Yields each key of the next JSON object, the caller must consume the value before the next key is read.
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.decode_value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("}")
+                return
+
+    def iter_array(self):
+        """
+        Yields once for each element of the next JSON array, the caller must consume the element.
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ",":
+                self.pos += 1
+            else:
+                self.expect("]")
+                return
+
+    def skip_value(self):
+        """
+        Skips over the next JSON value without building any large containers.
+        """
+        char = self.peek()
+        if char == "[":
+            for _ in self.iter_array():
+                self.skip_value()
+        elif char == "{":
+            for _ in self.iter_object():
+                self.skip_value()
+        else:
+            self.decode_value()
+
+
+def _records_to_frame(columns, row_count):
+    """
+    Builds a DataFrame from column lists, only fields that were present in at least one record become columns.
+    """
+    frame = pd.DataFrame({name: values for name, values in columns.items() if values.seen}, index=pd.RangeIndex(row_count))
+    return frame.infer_objects()
+
+
+class _Column(list):
+    """
+    List of values for one field that remembers if the field was ever present in the source records.
+    """
+    seen = False
+
+
+def _read_section(stream, fields):
+    """
+    Reads one array of records, keeping only the requested fields.
+    """
+    columns = {field: _Column() for field in fields}
+    row_count = 0
+    for _ in stream.iter_array():
+        record = stream.decode_value()
+        for field, values in columns.items():
+            if field in record:
+                values.seen = True
+            values.append(record.get(field))
+        row_count += 1
+    return _records_to_frame(columns, row_count)
+
+
+def _read_students(stream, fields):
+    """
+    Reads the Students array into one row per student lesson, the same shape as exploding StudentLessons.
+    """
+    columns = {field: _Column() for field in fields + STUDENT_LESSON_FIELDS}
+    row_count = 0
+    for _ in stream.iter_array():
+        student = stream.decode_value()
+        for lesson in student.get("StudentLessons") or []:
+            for field in fields:
+                if field in student:
+                    columns[field].seen = True
+                columns[field].append(student.get(field))
+            for field in STUDENT_LESSON_FIELDS:
+                if field in lesson:
+                    columns[field].seen = True
+                columns[field].append(lesson.get(field))
+            row_count += 1
+    return _records_to_frame(columns, row_count)
+
+
+def load_tfx(path, sections=TFX_FIELDS, chunk_size=CHUNK_SIZE, hashes=None):
+    """
+    Streams the required sections of a tfx file straight into DataFrames.
+
+    Parameters:
+    path (str): Path to the tfx file.
+    sections (dict): Section name mapped to the list of record fields to keep.
+    chunk_size (int): Number of characters read from the file at a time.
+    hashes (dict): Optional, filled with each section name mapped to the sha256 of the section's raw JSON text.
+
+    Returns:
+    dict: Section name mapped to a DataFrame, the Students frame has one row per student lesson with a ClassCode column.
+    """
+    frames = {}
+    with open(path, "r") as tfx_file:
+        stream = _JsonStream(tfx_file, chunk_size)
+        for key in stream.iter_object():
+            if key not in sections:
+                stream.skip_value()
+                continue
+            if hashes is not None:
+                stream.start_capture()
+            if key == "Students":
+                frames[key] = _read_students(stream, sections[key])
+            else:
+                frames[key] = _read_section(stream, sections[key])
+            if hashes is not None:
+                hashes[key] = stream.stop_capture()
+
+    # Sections missing from the file are returned empty so every exporter sees the same shape
+    for key in sections:
+        if key not in frames:
+            frames[key] = pd.DataFrame()
+            if hashes is not None:
+                hashes[key] = hashlib.sha256(b"").hexdigest()
+    return frames
+
+
+def hash_file(path):
+    """
+    Returns the sha256 of a file's contents.
+
+    Parameters:
+    path (str): Path to the file.
+
+    Returns:
+    str: The hex digest.
+    """
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(CHUNK_SIZE), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def _json_load_frames(path):
+    """
+    The original loading path, json.load the whole file then normalise each section.
+    """
+    with open(path, "r") as tfx_file:
+        tfx = json.load(tfx_file)
+    return {section: pd.json_normalize(tfx, record_path=section) for section in TFX_FIELDS}
+
+
+def compare_peak_memory(path):
+    """
+    Measures the peak Python memory and time of the json.load path against the streaming loader.
+
+    Parameters:
+    path (str): Path to the tfx file.
+
+    Returns:
+    dict: Loader name mapped to a dict with the peak memory in bytes and the time taken in seconds.
+    """
+    results = {}
+    for name, loader in [("json.load", _json_load_frames), ("streaming", load_tfx)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        frames = loader(path)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del frames
+        results[name] = {"peak_bytes": peak, "seconds": elapsed}
+    return results
+
+
+def print_peak_memory(path):
+    """
+    Prints the peak memory report for a tfx file.
+
+    Parameters:
+    path (str): Path to the tfx file.
+
+    Returns:
+    None
+    """
+    print(f"Peak memory loading {path}")
+    for name, result in compare_peak_memory(path).items():
+        print(f"    {name:<10} {result['peak_bytes'] / 1024 / 1024:>10.1f} MB {result['seconds']:>8.2f} s")
+
+
+if __name__ == "__main__":
+    # Report on the files given on the command line, or the two semester files from the config
+    if len(sys.argv) > 1:
+        tfx_paths = sys.argv[1:]
+    else:
+        import config
+        tfx_paths = [f"{config.filePath}{config.semester1_tfx_file}", f"{config.filePath}{config.semester2_tfx_file}"]
+
+    for tfx_path in tfx_paths:
+        print_peak_memory(tfx_path)
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import threading
+
+import pandas as pd
+
+from schema import SCHEMAS, apply_schema
+from tfx_loader import STUDENT_LESSON_FIELDS, TFX_FIELDS, hash_file, load_tfx
+
+### Parsed tfx Model ###
+# Every exporter used to run pd.json_normalize over the same tfx dict for the sections it needed, so each section
+# was normalised again for every exporter (and again for the SWD variants). A TfxModel normalises each section of one
+# tfx file exactly once and hands the same frame out to every exporter.
+
+# Copy-on-Write makes the shallow copies handed out by TfxModel behave as independent frames, an exporter changing
+# its copy can never change the frame shared with the other exporters. It is only turned on while the export runs, so
+# importing the exporter does not change how pandas behaves for the tool that imported it.
+
+
+def copy_on_write():
+    """
+    Turns on pandas Copy-on-Write until the with block ends, use it around code that works with TfxModel frames.
+
+    Returns:
+    pd.option_context: The context manager.
+    """
+    return pd.option_context("mode.copy_on_write", True)
+
+
+def enable_copy_on_write():
+    """
+    Turns on pandas Copy-on-Write for the rest of the process, for worker processes that only run the export.
+
+    Returns:
+    None
+    """
+    pd.set_option("mode.copy_on_write", True)
+
+
+class TfxModel:
+    """
+    The parsed sections of one Timetable Development (tfx) file, each section is normalised once on first use.
+
+    Parameters:
+    source (str or dict): Path to the tfx file to stream with tfx_loader, or an already loaded JSON tfx dict.
+    sections (dict): Section name mapped to the list of record fields to keep.
+    """
+
+    def __init__(self, source, sections=TFX_FIELDS):
+        self.source = source
+        self.sections = sections
+        self._frames = {}
+        self._hashes = {}
+        self._lock = threading.Lock()
+        self.normalisations = 0
+        self.requests = {}
+
+    def __getstate__(self):
+        # Locks can not be pickled, a copy sent to another process gets its own
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __getitem__(self, section):
+        """
+        Returns a read-only view of a section, normalising it first if this is the first time it has been asked for.
+
+        Parameters:
+        section (str): Section name, one of ClassNames, Timetable, Teachers or Students.
+
+        Returns:
+        pd.DataFrame: The section frame, the Students frame has one row per student lesson.
+        """
+        if section not in self.sections:
+            raise KeyError(f"{section} is not a section loaded from the tfx file.")
+        # Exporters running on other threads may ask for the same section at the same time, it is only loaded once
+        with self._lock:
+            self.requests[section] = self.requests.get(section, 0) + 1
+            if section not in self._frames:
+                self._load(section)
+            return self._frames[section].copy(deep=False)
+
+    def load(self):
+        """
+        Normalises every section now rather than on first use.
+
+        Returns:
+        None
+        """
+        with self._lock:
+            for section in self.sections:
+                if section not in self._frames:
+                    self._load(section)
+
+    def loaded_rows(self):
+        """
+        Counts the rows of the sections normalised so far, without normalising any more.
+
+        Returns:
+        int: The number of rows, the Students section counts one row per student lesson.
+        """
+        with self._lock:
+            return sum(len(df) for df in self._frames.values())
+
+    @property
+    def avoided(self):
+        """
+        Number of section requests that were served without normalising the section again.
+        """
+        return sum(count - 1 for count in self.requests.values())
+
+    def _load(self, section):
+        if isinstance(self.source, dict):
+            self._frames[section] = self._apply_schema(self._normalise(section), section)
+            self.normalisations += 1
+        else:
+            self._read_file()
+
+    def _read_file(self):
+        # The streaming loader reads every section in a single pass over the file
+        frames = load_tfx(self.source, self.sections, hashes=self._hashes)
+        self._frames.update({section: self._apply_schema(df, section) for section, df in frames.items()})
+        self.normalisations += len(self.sections)
+
+    def _apply_schema(self, df, section):
+        # Sections without a schema, such as extra sections asked for by a caller, keep the dtypes they were read with
+        if section not in SCHEMAS:
+            return df
+        return apply_schema(df, section)
+
+    def _normalise(self, section):
+        """
+        Normalises one section of a JSON tfx dict into the same shape as the streaming loader.
+        """
+        if section not in self.source:
+            return pd.DataFrame()
+        fields = self.sections[section]
+        df = pd.json_normalize(self.source, record_path=section)
+
+        if section == "Students":
+            # Expand out the student lessons JSON into columns, each students subjects are listed under StudentLessons
+            df = df.explode("StudentLessons").dropna(subset=["StudentLessons"]).reset_index(drop=True)
+            lessons_df = pd.json_normalize(df["StudentLessons"].tolist())
+            lessons_df = lessons_df[[col for col in STUDENT_LESSON_FIELDS if col in lessons_df.columns]]
+            df = pd.concat([df[[col for col in fields if col in df.columns]], lessons_df], axis=1)
+        else:
+            df = df[[col for col in fields if col in df.columns]]
+
+        return df
+
+    def file_hash(self):
+        """
+        Returns the sha256 of the tfx file, a cheap check for a file that has not changed at all.
+
+        Returns:
+        str: The hex digest, or None when the model was made from a dict.
+        """
+        if isinstance(self.source, dict):
+            return None
+        return hash_file(self.source)
+
+    def section_hashes(self):
+        """
+        Returns a content hash for each section, parsing the file if it has not been parsed yet.
+
+        Returns:
+        dict: Section name mapped to the sha256 of the section.
+        """
+        with self._lock:
+            if isinstance(self.source, dict):
+                for section in self.sections:
+                    if section not in self._hashes:
+                        text = json.dumps(self.source.get(section, []), sort_keys=True)
+                        self._hashes[section] = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            elif not self._frames:
+                self._read_file()
+            return dict(self._hashes)
+
+    def summary(self):
+        """
+        Returns a one line summary of the normalisation counters.
+
+        Returns:
+        str: The summary line.
+        """
+        return f"{self.normalisations} sections normalised, {sum(self.requests.values())} requests, {self.avoided} normalisations avoided"
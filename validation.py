@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+### Schools Online Validation ###
+# The checks Schools Online would reject an upload for, run over the final teachers, classes and enrolments frames
+# before anything is written. Like rules.py the checks are kept as data, each one is a row in VALIDATION_RULES:
+#   (rule, severity, frame, column, check, message)
+# Each check looks at a whole column at once and every row that fails becomes a row of the violations report.
+# Errors will stop an upload, warnings are worth a look but may be fine (such as a team taught class).
+
+# Schools Online limits
+CLASS_CODE_MAX_LENGTH = 10
+TEACHER_CODE_MAX_LENGTH = 8
+
+# Characters other than these in a teacher's name cause problems on upload
+TEACHER_NAME_INVALID_CHARACTERS = r"[^A-Za-z '\-]"
+
+VALIDATION_REPORT_FILE = "Validation_Report.csv"
+
+# Column that identifies a row of each frame in the violations report
+FRAME_KEYS = {
+    "teachers": "Teacher Code",
+    "classes": "School Class Code",
+    "enrolments": "Student Code",
+}
+
+
+class MaxLength:
+    """
+    Check that fails values longer than the length.
+
+    Parameters:
+    length (int): The longest value allowed.
+    """
+
+    def __init__(self, length):
+        self.length = length
+
+    def __call__(self, column):
+        return column.astype("string").str.len().gt(self.length).to_numpy(dtype=bool, na_value=False)
+
+
+class InvalidCharacters:
+    """
+    Check that fails values containing a character matched by the pattern.
+
+    Parameters:
+    pattern (str): Regular expression matching one invalid character.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def __call__(self, column):
+        return column.astype("string").str.contains(self.pattern, regex=True).to_numpy(dtype=bool, na_value=False)
+
+
+class Missing:
+    """
+    Check that fails blank or missing values.
+    """
+
+    def __call__(self, column):
+        column = column.astype("string")
+        return (column.isna() | column.str.strip().eq("")).to_numpy(dtype=bool, na_value=True)
+
+
+class Duplicated:
+    """
+    Check that fails every row whose value is on more than one row.
+    """
+
+    def __call__(self, column):
+        return column.duplicated(keep=False).to_numpy()
+
+
+VALIDATION_RULES = [
+    ("class_code_length", "error", "classes", "School Class Code", MaxLength(CLASS_CODE_MAX_LENGTH), f"School Class Code is longer than {CLASS_CODE_MAX_LENGTH} characters"),
+    ("teacher_code_length", "error", "teachers", "Teacher Code", MaxLength(TEACHER_CODE_MAX_LENGTH), f"Teacher Code is longer than {TEACHER_CODE_MAX_LENGTH} characters"),
+    ("teacher_name_characters", "error", "teachers", "Given Names", InvalidCharacters(TEACHER_NAME_INVALID_CHARACTERS), "Given Names has a special character"),
+    ("teacher_name_characters", "error", "teachers", "Family Name", InvalidCharacters(TEACHER_NAME_INVALID_CHARACTERS), "Family Name has a special character"),
+    ("missing_bos_code", "error", "enrolments", "Registration Number", Missing(), "Student has no BOSCode (SACE Registration Number)"),
+    ("multiple_teachers", "warning", "classes", "School Class Code", Duplicated(), "School Class Code has more than one teacher, team taught?"),
+]
+
+VIOLATION_COLUMNS = ["Rule", "Severity", "Frame", "Row", "Key", "Column", "Value", "Message"]
+
+
+def validate(frames, rules=VALIDATION_RULES):
+    """
+    Runs every validation rule over the final frames.
+
+    Parameters:
+    frames (dict): Frame name (teachers, classes or enrolments) mapped to the DataFrame.
+    rules (list): The (rule, severity, frame, column, check, message) rules to run.
+
+    Returns:
+    pd.DataFrame: One row for each failed check, Row is the position of the row in its frame.
+    """
+    violations = []
+    for rule, severity, frame, column, check, message in rules:
+        df = frames.get(frame)
+        # A frame without the column has nothing to check, such as enrolments from a tfx file with no BOSCode
+        if df is None or column not in df.columns:
+            continue
+        rows = np.flatnonzero(check(df[column]))
+        if len(rows) == 0:
+            continue
+        key = FRAME_KEYS.get(frame)
+        violations.append(pd.DataFrame({
+            "Rule": rule,
+            "Severity": severity,
+            "Frame": frame,
+            "Row": rows,
+            "Key": df[key].iloc[rows].to_numpy(dtype=object) if key in df.columns else "",
+            "Column": column,
+            "Value": df[column].iloc[rows].to_numpy(dtype=object),
+            "Message": message,
+        }))
+
+    if not violations:
+        return pd.DataFrame(columns=VIOLATION_COLUMNS)
+    return pd.concat(violations, ignore_index=True)
+
+
+def write_violations(violations, output_folder):
+    """
+    Writes the violations report and prints how many rows failed each rule.
+
+    Parameters:
+    violations (pd.DataFrame): The validate result.
+    output_folder (str): Folder the Validation_Report.csv file is written to.
+
+    Returns:
+    str: Path of the report.
+    """
+    path = os.path.join(output_folder, VALIDATION_REPORT_FILE)
+    violations.to_csv(path, index=False)
+
+    if len(violations) == 0:
+        print("All validation checks passed! Clear to upload.")
+        return path
+
+    print("Validation:")
+    for (rule, severity), count in violations.groupby(["Rule", "Severity"], sort=False).size().items():
+        print(f"    {severity:<8} {rule:<24} {count:>6} rows")
+    print(f"See {path} for every row.")
+    return path
+
+
+def error_count(violations):
+    """
+    Counts the violations that will stop an upload.
+
+    Parameters:
+    violations (pd.DataFrame): The validate result.
+
+    Returns:
+    int: Number of error violations.
+    """
+    return int((violations["Severity"] == "error").sum())
@@ -0,0 +1,172 @@
+import os
+import time
+import traceback
+
+from backends import get_backend
+from create_files import merge_semesters, validate_export, write_export
+from export_cache import ExportCache
+from schema import reset_memory_savings
+from tfx_model import TfxModel, copy_on_write
+
+### Watch Mode ###
+# Keeps the exporter running while the timetable is being built. Both tfx files are parsed once and kept in memory,
+# and the files are polled for changes. When a file is saved only the frames made from the sections that changed are
+# rebuilt, then the semesters are merged and validated again, so the checks are printed within about a second of
+# saving. There is no file change notification in the standard library so the files are polled.
+
+# Seconds between checks of the tfx files
+POLL_SECONDS = 0.2
+
+# A changed file must stay the same for this many seconds before it is read, the timetabler writes files in parts
+SETTLE_SECONDS = 0.3
+
+
+def _file_stamp(path):
+    """
+    The modified time and size of a file, or None if it does not exist right now (such as part way through a save).
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Watcher:
+    """
+    The parsed semesters and the frames built from them, kept in memory between saves.
+
+    Parameters:
+    settings (dict): export_school arguments, from config.export_settings().
+    write (bool): Also write the import files after each save, otherwise only the checks are run.
+    """
+
+    def __init__(self, settings, write=False):
+        self.settings = settings
+        self.write = write
+        self.paths = {1: settings["semester1_tfx_path"], 2: settings["semester2_tfx_path"]}
+        self.backend = get_backend(settings.get("backend", "pandas"))
+        self.stamps = {}
+        self.models = {}
+        self.hashes = {}
+        self.teachers_df = None
+        self.enrolments = {}
+        self.classes = {}
+        os.makedirs(settings["output_folder"], exist_ok=True)
+
+    def changed_semesters(self):
+        """
+        Finds the semesters whose tfx file has changed and has stopped changing.
+
+        Returns:
+        list: The semester numbers to reload, empty if nothing has changed.
+        """
+        changed = [semester for semester, path in self.paths.items() if _file_stamp(path) != self.stamps.get(semester)]
+        if not changed:
+            return []
+
+        # Wait for the save to finish, any change while waiting starts the wait again
+        stamps = {semester: _file_stamp(self.paths[semester]) for semester in changed}
+        while True:
+            time.sleep(SETTLE_SECONDS)
+            settled = {semester: _file_stamp(self.paths[semester]) for semester in changed}
+            if settled == stamps and None not in settled.values():
+                return changed
+            stamps = settled
+
+    def forget(self, semesters):
+        """
+        Drops the frames kept in memory and the models of the semesters given, so the next refresh rereads those
+        semesters and rebuilds everything.
+
+        Parameters:
+        semesters (list): The semester numbers whose model is dropped.
+
+        Returns:
+        None
+        """
+        for semester in semesters:
+            self.models.pop(semester, None)
+        self.hashes = {}
+        self.teachers_df = None
+        self.enrolments = {}
+        self.classes = {}
+
+    def refresh(self, changed):
+        """
+        Reloads the changed semesters and rebuilds only the frames made from sections that changed.
+
+        Parameters:
+        changed (list): The semester numbers whose tfx file changed.
+
+        Returns:
+        tuple: The validate_export result.
+        """
+        # The frames of the models kept in memory are shared between the frames built from them
+        with copy_on_write():
+            return self._rebuild(changed)
+
+    def _rebuild(self, changed):
+        school_number, year = self.settings["school_number"], self.settings["year"]
+        reset_memory_savings()
+
+        # A semester that could not be read last time is read again along with the one that changed
+        changed_sections = {}
+        for semester in sorted(set(changed) | (set(self.paths) - set(self.models))):
+            # The stamp is taken before reading, a save during the read is picked up on the next poll
+            self.stamps[semester] = _file_stamp(self.paths[semester])
+            model = TfxModel(self.paths[semester])
+            model.load()
+            hashes = model.section_hashes()
+            changed_sections[semester] = {section for section, value in hashes.items() if self.hashes.get(semester, {}).get(section) != value}
+            self.models[semester], self.hashes[semester] = model, hashes
+
+        rebuilt = []
+        if self.teachers_df is None or any("Teachers" in sections for sections in changed_sections.values()):
+            self.teachers_df = self.backend.teachers(self.models[1], self.models[2], school_number)
+            rebuilt.append("teachers")
+        for semester in (1, 2):
+            sections = changed_sections.get(semester, set())
+            if semester not in self.enrolments or sections:
+                self.enrolments[semester] = self.backend.enrolments(self.models[semester], semester, school_number, year)
+                rebuilt.append(f"enrolments S{semester}")
+            if semester not in self.classes or "teachers" in rebuilt or sections & {"ClassNames", "Timetable"}:
+                self.classes[semester] = self.backend.classes(self.teachers_df, self.models[semester], semester, school_number, year)
+                rebuilt.append(f"classes S{semester}")
+        print(f"Rebuilt: {', '.join(rebuilt) or 'nothing, no section the export uses changed'}")
+
+        merged = merge_semesters(self.enrolments[1], self.enrolments[2], self.classes[1], self.classes[2])
+        validated = validate_export((self.teachers_df, None), merged, self.settings["output_folder"])
+        if self.write:
+            # The incremental cache would drop the cached frames of the last full export, so every file is written
+            export_cache = ExportCache(self.settings["output_folder"], enabled=False)
+            write_export(validated, self.settings["output_folder"], self.settings.get("output_workers", 1), export_cache)
+        return validated
+
+    def run(self, poll_seconds=POLL_SECONDS):
+        """
+        Watches the tfx files until stopped with Ctrl+C, re-running the export each time one is saved.
+
+        Parameters:
+        poll_seconds (float): Seconds between checks of the tfx files.
+
+        Returns:
+        None
+        """
+        print(f"Watching {self.paths[1]} and {self.paths[2]}, press Ctrl+C to stop.")
+        try:
+            while True:
+                changed = self.changed_semesters()
+                if changed:
+                    start = time.perf_counter()
+                    print(f"\nSemester {' and '.join(str(semester) for semester in changed)} changed at {time.strftime('%H:%M:%S')}")
+                    try:
+                        self.refresh(changed)
+                    except Exception:
+                        # A file that can not be read is tried again on its next save, everything is rebuilt then
+                        print(traceback.format_exc().strip().splitlines()[-1])
+                        self.forget(changed)
+                    print(f"Checked in {time.perf_counter() - start:.2f} s")
+                time.sleep(poll_seconds)
+        except KeyboardInterrupt:
+            print("Stopped watching.")